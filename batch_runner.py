@@ -0,0 +1,242 @@
+"""
+Local batch runner for bulk backfills.
+
+Processes a directory, manifest or S3 prefix of PDFs through the same pipeline as
+lambda_handler, fanned out over a process pool. Completed documents are appended to a
+JSONL checkpoint so an interrupted run can be resumed, and a throughput summary
+(documents/minute, pages/second) is printed at the end.
+
+Examples:
+    python batch_runner.py statements/ --workers 8
+    python batch_runner.py manifest.txt --checkpoint backfill.jsonl
+    python batch_runner.py s3://starwarsbff/archive/2023/ --workers 16
+    python batch_runner.py statements/ --offline --output-dir out/ --responses-dir recorded/
+    python batch_runner.py statements/ --index results.sqlite
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Per-process pipeline backends, set up once by init_worker
+_storage = None
+_textract_client = None
+_export = False
+
+def list_documents(source):
+    """
+    Lists the PDFs to process.
+    :param source: Directory of PDFs, manifest file (one path or s3:// URI per line) or s3://bucket/prefix.
+    :return: Sorted list of local paths and/or s3:// URIs.
+    """
+    if source.startswith('s3://'):
+        from src.storage import S3Storage, parse_s3_uri
+        bucket, prefix = parse_s3_uri(source)
+        storage = S3Storage(bucket)
+        return sorted(f"s3://{bucket}/{key}" for key in storage.list_keys(prefix) if key.lower().endswith('.pdf'))
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source) if name.lower().endswith('.pdf'))
+    with open(source, 'r') as manifest:
+        return [line.strip() for line in manifest if line.strip() and not line.startswith('#')]
+
+def load_checkpoint(checkpoint_path):
+    """
+    Reads the documents already completed by a previous run.
+    :param checkpoint_path: Path of the JSONL checkpoint file.
+    :return: Set of document identifiers that finished successfully.
+    """
+    completed = set()
+    if not os.path.exists(checkpoint_path):
+        return completed
+    with open(checkpoint_path, 'r') as checkpoint:
+        for line in checkpoint:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            if record.get('status') == 'ok':
+                completed.add(record['document'])
+    return completed
+
+def init_worker(offline, output_dir, responses_dir, export=False):
+    """Configures the storage and Textract backends of a worker process."""
+    global _storage, _textract_client, _export
+    _export = export
+    if offline:
+        from src.storage import LocalStorage
+        from src.textract_stub import LocalTextractClient
+        _storage = LocalStorage(output_dir)
+        _textract_client = LocalTextractClient(responses_dir)
+    elif output_dir:
+        from src.storage import LocalStorage
+        _storage = LocalStorage(output_dir)
+
+def run_document(document):
+    """
+    Processes one document in a worker process.
+    :param document: Local path or s3:// URI of the PDF.
+    :return: Checkpoint record with status, page count and timing.
+    """
+    from lambda_function import process_document, save_result_to_s3, s3_storage
+    from src.storage import S3Storage, parse_s3_uri, document_id
+    from src.metrics import metrics
+    from src.template_matching import load_template, split_template
+    from src.columnar_export import flatten_result
+    from src.result_index import index_entry, file_etag
+    from src.workspace import Workspace
+    from config import WORKSPACE_EXPANSION_FACTOR
+
+    metrics.start_invocation()
+    storage = _storage or s3_storage
+    started = time.perf_counter()
+    record = {"document": document, "status": "error", "pages": 0}
+    try:
+        # The size of an S3 document is unknown until it is downloaded, so it gets a disk-backed workspace
+        is_s3 = document.startswith('s3://')
+        expected_bytes = None if is_s3 else os.path.getsize(document) * WORKSPACE_EXPANSION_FACTOR
+        document_name = os.path.splitext(os.path.basename(document))[0]
+        # Each document gets its own workspace so concurrent workers never share page images
+        with Workspace(document_name, expected_bytes) as workspace:
+            if is_s3:
+                bucket, key = parse_s3_uri(document)
+                local_pdf_path = workspace.file(os.path.basename(key))
+                S3Storage(bucket).download_file(key, local_pdf_path)
+                workspace.track(local_pdf_path)
+            else:
+                # The full path keeps documents with the same file name in different folders apart
+                key = document
+                local_pdf_path = document
+
+            template = load_template()
+            result, stats = process_document(local_pdf_path, key, storage, _textract_client, workspace=workspace,
+                                             template=template)
+            etag = file_etag(local_pdf_path)
+        record.update(stats)
+        if result is not None:
+            result_key = f"extraction_results/extraction_result_{document_id(document)}.json"
+            if save_result_to_s3(result, storage.bucket, result_key, storage):
+                record.update(status="ok", result=storage.uri(result_key))
+                # Index entries go back to the parent, which writes them in one place
+                record["index"] = index_entry(result, storage.uri(result_key), document, etag)
+            if _export:
+                # Flattened records go back to the parent, which buffers them across documents
+                sections, _ = split_template(template)
+                record["export"] = flatten_result(result, sections, key)
+    except Exception as e:
+        logging.error(f"Error processing {document}: {e}", exc_info=True)
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    metrics.emit({"Function": "batch_runner"})
+    return record
+
+def summarize(records, elapsed):
+    """
+    Builds the throughput summary of a run.
+    :param records: Checkpoint records of the documents processed in this run.
+    :param elapsed: Wall-clock seconds of the run.
+    :return: Summary dictionary.
+    """
+    succeeded = [r for r in records if r['status'] == 'ok']
+    pages = sum(r.get('pages', 0) for r in records)
+    seconds = [r['seconds'] for r in records]
+    return {
+        "documents": len(records),
+        "succeeded": len(succeeded),
+        "failed": len(records) - len(succeeded),
+        "pages": pages,
+        "elapsed_seconds": round(elapsed, 3),
+        "documents_per_minute": round(len(records) * 60 / elapsed, 2) if elapsed else 0.0,
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else 0.0,
+        "mean_document_seconds": round(sum(seconds) / len(seconds), 3) if seconds else 0.0,
+        "max_document_seconds": max(seconds) if seconds else 0.0
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Process a batch of PDFs through the extraction pipeline.")
+    parser.add_argument('source', help="Directory of PDFs, manifest file, or s3://bucket/prefix")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument('--checkpoint', default='batch_checkpoint.jsonl', help="JSONL checkpoint used to resume runs")
+    parser.add_argument('--output-dir', help="Write uploads and results to this local directory instead of S3")
+    parser.add_argument('--offline', action='store_true', help="Use local storage and the stubbed Textract client")
+    parser.add_argument('--responses-dir', help="Recorded Textract responses replayed by the stub (with --offline)")
+    parser.add_argument('--limit', type=int, help="Process at most this many pending documents")
+    parser.add_argument('--export', action='store_true', help="Also write the columnar analytics export")
+    parser.add_argument('--export-max-age', type=int, default=300, help="Flush the export buffer after this many seconds")
+    parser.add_argument('--index', help="Add the results to this local SQLite result index "
+                                        "instead of writing an index segment to the output storage")
+    parser.add_argument('--summary', help="Also write the throughput summary to this JSON file")
+    args = parser.parse_args(argv)
+    if args.offline and not args.output_dir:
+        parser.error("--offline requires --output-dir")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.offline:
+        # Keep logs local; must be set before the pipeline modules are imported
+        os.environ['CLOUDWATCH_LOGS'] = 'false'
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    documents = list_documents(args.source)
+    completed = load_checkpoint(args.checkpoint)
+    pending = [d for d in documents if d not in completed]
+    if args.limit:
+        pending = pending[:args.limit]
+    logging.info(f"{len(documents)} documents found, {len(completed)} already completed, {len(pending)} to process")
+
+    from src.storage import LocalStorage, S3Storage
+    from config import BUCKET, INDEX_ENABLED
+    output_storage = LocalStorage(args.output_dir) if args.output_dir else S3Storage(BUCKET)
+
+    export_buffer = None
+    if args.export:
+        from src.columnar_export import ColumnarExportBuffer
+        export_buffer = ColumnarExportBuffer(output_storage, max_age_seconds=args.export_max_age)
+    index_entries = []
+
+    records = []
+    started = time.perf_counter()
+    with open(args.checkpoint, 'a') as checkpoint, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                initargs=(args.offline, args.output_dir, args.responses_dir, args.export)) as pool:
+        futures = [pool.submit(run_document, document) for document in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            exported = record.pop("export", None)
+            entry = record.pop("index", None)
+            if entry:
+                index_entries.append(entry)
+            if exported:
+                export_buffer.add(exported)
+                export_buffer.flush_if_due()
+            records.append(record)
+            checkpoint.write(json.dumps(record) + '\n')
+            checkpoint.flush()
+            logging.info(f"[{len(records)}/{len(pending)}] {record['document']}: {record['status']} "
+                         f"({record.get('pages', 0)} pages in {record['seconds']}s)")
+
+    if export_buffer:
+        export_buffer.flush()
+
+    if index_entries and args.index:
+        from src.result_index import ResultIndex
+        with ResultIndex(args.index) as index:
+            index.add(index_entries)
+        logging.info(f"Added {len(index_entries)} results to {args.index}")
+    elif index_entries and INDEX_ENABLED:
+        from src.result_index import write_segment
+        write_segment(output_storage, index_entries)
+
+    summary = summarize(records, time.perf_counter() - started)
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, 'w') as file:
+            json.dump(summary, file, indent=2)
+    return 0 if summary['failed'] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
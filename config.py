@@ -11,12 +11,36 @@ S3_BUCKET = "starwarsbff"
 
 # Textract Configuration
 TEXTRACT_FEATURES = ["TABLES", "FORMS"]
+# Approximate AnalyzeDocument price per page (USD) for each FeatureTypes combination
+TEXTRACT_PAGE_PRICES = {
+    "FORMS+TABLES": 0.065,
+    "FORMS": 0.05,
+    "TABLES": 0.015,
+    "NONE": 0.0
+}
+
+# Page Rendering Configuration
+# 'pypdfium2' renders in-process; 'pdf2jpg' runs the Java-based converter (needs a JRE)
+RENDER_BACKEND = os.environ.get('RENDER_BACKEND', 'pypdfium2')
+# pdf2jpg's default resolution
+RENDER_DPI = int(os.environ.get('RENDER_DPI', 300))
+RENDER_JPEG_QUALITY = int(os.environ.get('RENDER_JPEG_QUALITY', 90))
+
+# Page Triage Configuration
+TRIAGE_ENABLED = os.environ.get('TRIAGE_ENABLED', 'true').lower() == 'true'
+TRIAGE_DETECT_TABLES = os.environ.get('TRIAGE_DETECT_TABLES', 'true').lower() == 'true'
+BLANK_PAGE_INK_RATIO = float(os.environ.get('BLANK_PAGE_INK_RATIO', 0.0003))
+BLANK_PAGE_STDDEV = float(os.environ.get('BLANK_PAGE_STDDEV', 2.0))
+TRIAGE_MIN_RULE_LENGTH = float(os.environ.get('TRIAGE_MIN_RULE_LENGTH', 0.3))
+TRIAGE_MIN_TABLE_RULES = int(os.environ.get('TRIAGE_MIN_TABLE_RULES', 3))
 
 # Template Configuration
 TEMPLATE_S3_KEY = os.environ.get('TEMPLATE_S3_KEY', 'templates/template.json')
 
 # Logging Configuration
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# Set to false to keep logs local (offline batch runs without CloudWatch access)
+CLOUDWATCH_LOGS = os.environ.get('CLOUDWATCH_LOGS', 'true').lower() == 'true'
 
 # Input and Output Paths
 INPUT_PREFIX = 'input/'
@@ -26,6 +50,70 @@ INTERMEDIATE_PREFIX = 'intermediate/'
 # Performance Configuration
 MAX_CONCURRENT_PAGES = int(os.environ.get('MAX_CONCURRENT_PAGES', 5))
 
+# Metrics Configuration (CloudWatch Embedded Metric Format on stdout)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'TextractExtraction')
+METRICS_TRACEMALLOC = os.environ.get('METRICS_TRACEMALLOC', 'false').lower() == 'true'
+PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', 'false').lower() == 'true'
+
+# Columnar Export Configuration (analytics sink for extraction results)
+EXPORT_ENABLED = os.environ.get('EXPORT_ENABLED', 'false').lower() == 'true'
+EXPORT_PREFIX = os.environ.get('EXPORT_PREFIX', 'analytics/')
+EXPORT_FORMAT = os.environ.get('EXPORT_FORMAT', 'ndjson')  # 'ndjson' (gzip) or 'parquet' (needs pyarrow)
+EXPORT_MAX_RECORDS = int(os.environ.get('EXPORT_MAX_RECORDS', 5000))
+EXPORT_MAX_AGE_SECONDS = int(os.environ.get('EXPORT_MAX_AGE_SECONDS', 300))
+
+# Selective re-OCR of low-confidence template fields
+REFINE_ENABLED = os.environ.get('REFINE_ENABLED', 'false').lower() == 'true'
+REFINE_CONFIDENCE_THRESHOLD = float(os.environ.get('REFINE_CONFIDENCE_THRESHOLD', 80))
+REFINE_DPI = int(os.environ.get('REFINE_DPI', 600))
+REFINE_MAX_REGIONS = int(os.environ.get('REFINE_MAX_REGIONS', 10))
+# Padding around each cropped region, as a fraction of the page size
+REFINE_PADDING = float(os.environ.get('REFINE_PADDING', 0.005))
+
+# Raw Textract responses, persisted per document for replay
+RAW_RESPONSES_ENABLED = os.environ.get('RAW_RESPONSES_ENABLED', 'true').lower() == 'true'
+RAW_RESPONSES_PREFIX = os.environ.get('RAW_RESPONSES_PREFIX', 'raw_responses/')
+
+# Template zones: fields read from DetectDocumentText output at anchor-relative positions
+ZONES_ENABLED = os.environ.get('ZONES_ENABLED', 'true').lower() == 'true'
+
+# Result index: one segment of key fields per saved result, merged into a SQLite index by query_index.py
+INDEX_ENABLED = os.environ.get('INDEX_ENABLED', 'true').lower() == 'true'
+INDEX_PREFIX = os.environ.get('INDEX_PREFIX', 'result_index/')
+
+# Learned key aliases: raw keys that resolved to template keys, stored per template version
+ALIASES_ENABLED = os.environ.get('ALIASES_ENABLED', 'true').lower() == 'true'
+ALIASES_PREFIX = os.environ.get('ALIASES_PREFIX', 'key_aliases/')
+# Segments merged on load beyond which a container compacts them into one
+ALIASES_MAX_SEGMENTS = int(os.environ.get('ALIASES_MAX_SEGMENTS', 50))
+
+# Per-document scratch workspaces
+WORKSPACE_ROOT = os.environ.get('WORKSPACE_ROOT', '/tmp/workspaces')
+# 'auto' uses the memory-backed root for documents expected to fit WORKSPACE_MEMORY_BUDGET_BYTES
+WORKSPACE_MODE = os.environ.get('WORKSPACE_MODE', 'auto')
+# Lambda's /tmp is 512 MB by default
+WORKSPACE_BUDGET_BYTES = int(os.environ.get('WORKSPACE_BUDGET_BYTES', 400 * 1024 * 1024))
+WORKSPACE_MEMORY_ROOT = os.environ.get('WORKSPACE_MEMORY_ROOT', '/dev/shm')
+WORKSPACE_MEMORY_BUDGET_BYTES = int(os.environ.get('WORKSPACE_MEMORY_BUDGET_BYTES', 128 * 1024 * 1024))
+# Rendered page images are typically this many times larger than the PDF
+WORKSPACE_EXPANSION_FACTOR = int(os.environ.get('WORKSPACE_EXPANSION_FACTOR', 20))
+
+# Map-reduce fan-out: large PDFs are split into page chunks analyzed by worker invocations
+FANOUT_ENABLED = os.environ.get('FANOUT_ENABLED', 'false').lower() == 'true'
+# Documents with more pages than this are fanned out
+FANOUT_MIN_PAGES = int(os.environ.get('FANOUT_MIN_PAGES', 40))
+FANOUT_CHUNK_PAGES = int(os.environ.get('FANOUT_CHUNK_PAGES', 10))
+FANOUT_MAX_CONCURRENCY = int(os.environ.get('FANOUT_MAX_CONCURRENCY', 10))
+# Worker function; defaults to the running function, which handles chunk events itself
+FANOUT_FUNCTION_NAME = os.environ.get('FANOUT_FUNCTION_NAME', os.environ.get('AWS_LAMBDA_FUNCTION_NAME', ''))
+FANOUT_CHUNKS_PREFIX = os.environ.get('FANOUT_CHUNKS_PREFIX', 'chunks/')
+
+# Early termination: stop analyzing pages once every template field is filled
+EARLY_EXIT_ENABLED = os.environ.get('EARLY_EXIT_ENABLED', 'false').lower() == 'true'
+# Maximum number of pages sent to Textract per document (0 = no limit)
+MAX_PAGES = int(os.environ.get('MAX_PAGES', 0))
+
 # Error Handling
 MAX_RETRIES = int(os.environ.get('MAX_RETRIES', 3))
 RETRY_DELAY = int(os.environ.get('RETRY_DELAY', 5))
@@ -1,13 +1,29 @@
 import os
 import json
 from datetime import datetime
-from src.document_preparation import prepare_document
+from src.document_preparation import iter_page_files
 from src.textract_api import analyze_document
 from src.response_parser import parse_response
 from src.document_specific_processing import process_checkboxes
-from src.template_matching import match_template, log_matching_results
+from src.template_matching import (match_template, log_matching_results, load_template, split_template,
+                                   TemplateProgress)
+from src.page_triage import triage_rendered_page, build_triage_report
+from src.table_index import TableIndex
+from src.refinement import refine_low_confidence
+from src.response_store import ResponseBundle
+from src.fanout import split_pdf, count_pages, chunk_page_limits, LambdaDispatcher
+from src.zone_extraction import ZoneExtractor, merge_zone_data
+from src.result_index import index_entry, write_segment, file_etag
+from src.key_aliases import aliases
+from src.workspace import Workspace, WorkspaceBudgetExceeded
 from src.post_processing import post_process
-from config import BUCKET, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION
+from src.storage import S3Storage, document_id
+from src.metrics import metrics, stage, timed, increment
+from src.columnar_export import stage_records, compact_staging, flatten_result
+from config import (BUCKET, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, EARLY_EXIT_ENABLED, MAX_PAGES,
+                    EXPORT_ENABLED, REFINE_ENABLED, RAW_RESPONSES_ENABLED, FANOUT_ENABLED, FANOUT_MIN_PAGES,
+                    FANOUT_FUNCTION_NAME, FANOUT_CHUNKS_PREFIX, ZONES_ENABLED,
+                    INDEX_ENABLED, WORKSPACE_EXPANSION_FACTOR, TEXTRACT_FEATURES)
 import boto3
 from botocore.exceptions import ClientError
 import logging
@@ -20,38 +36,88 @@ s3_client = boto3.client('s3',
                          aws_access_key_id=AWS_ACCESS_KEY_ID,
                          aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
                          region_name=AWS_REGION)
+s3_storage = S3Storage(BUCKET, s3_client)
 
-def save_intermediate_result(data, filename):
-    """Save intermediate results directly to S3."""
+def save_intermediate_result(data, filename, storage=None):
+    """Save intermediate results directly to S3 (or the given storage)."""
+    storage = storage or s3_storage
     s3_object_name = f"intermediate_results/{filename}"
     try:
-        s3_client.put_object(Body=json.dumps(data, indent=2), Bucket=BUCKET, Key=s3_object_name)
-        logging.info(f"Intermediate result saved to S3 as {BUCKET}/{s3_object_name}")
-    except ClientError as e:
-        logging.error(f"Error saving intermediate result to S3: {e}")
+        storage.put_object(s3_object_name, json.dumps(data, indent=2))
+        logging.info(f"Intermediate result saved as {storage.uri(s3_object_name)}")
+    except (ClientError, OSError) as e:
+        logging.error(f"Error saving intermediate result: {e}")
+
+def process_single_file(s3_file, file_index, feature_types=None, document_name=None, storage=None, textract_client=None,
+                        table_index=None, page_image=None, pdf_path=None, bundle=None, zone_extractor=None,
+                        pdf_page=None, template=None):
+    """
+    Process a single file using Textract and save results to S3.
 
-def process_single_file(s3_file, file_index):
-    """Process a single file using Textract and save results to S3."""
+    When a document-wide table_index is given, the page's tables are added to it and
+    matched once per document instead of per page. With REFINE_ENABLED, low-confidence
+    template fields are re-read from high-resolution crops of page_image/pdf_path, where
+    pdf_page is the page's number within pdf_path when that is a fan-out chunk.
+    The raw responses are added to bundle, when given, for later replay. Pages covered by
+    the zone_extractor are read with text detection first; FORMS is only dropped when the
+    page's zones validate and cover every key-value field of the template, otherwise the
+    validated zone values are overlaid on the analyzed fields. template is the full template of the document, loaded once by
+    the caller so every page is matched against the same version.
+    """
+    storage = storage or s3_storage
+    template = template if template is not None else load_template()
     logging.info(f"Processing file: {s3_file}")
-    response = analyze_document(s3_file, BUCKET)
+
+    zone_data, text_response = None, None
+    if zone_extractor is not None and zone_extractor.covers(file_index + 1):
+        zone_data, failed, text_response = zone_extractor.read_page(s3_file, storage.bucket, file_index + 1,
+                                                                    textract_client)
+        if not failed and zone_extractor.covers_forms(file_index + 1):
+            # The zones filled every key-value field, so FORMS analysis is no longer needed; tables still are
+            feature_types = [feature for feature in feature_types or TEXTRACT_FEATURES if feature != 'FORMS']
+            if not feature_types:
+                logging.info(f"All zones of {s3_file} validated; skipping document analysis")
+                increment("ZonePages")
+                if bundle is not None:
+                    bundle.add_page(file_index + 1, s3_file, [], None, text_response)
+                if table_index is not None:
+                    table_index.add_page(file_index + 1, [])
+                return post_process(zone_data)
+
+    response = analyze_document(s3_file, storage.bucket, feature_types, textract_client)
     if not response:
         logging.error(f"Failed to analyze document: {s3_file}")
         return None
+    if bundle is not None:
+        bundle.add_page(file_index + 1, s3_file, feature_types, response, text_response)
 
     parsed_kv, parsed_tables = parse_response(response)
-    
+
+    if REFINE_ENABLED and page_image:
+        sections, _ = split_template(template)
+        parsed_kv, parsed_tables, _ = refine_low_confidence(response, parsed_kv, parsed_tables, sections, page_image,
+                                                            pdf_path, pdf_page or file_index + 1, textract_client)
+
+    # Intermediate results are grouped per document so concurrent documents do not overwrite each other
+    prefix = f"{document_name}/" if document_name else ""
+
     # Save extracted data
     extracted_data = {
         "key_value_pairs": parsed_kv,
         "tables": parsed_tables
     }
-    save_intermediate_result(extracted_data, f"extracted_data_{file_index}.json")
+    save_intermediate_result(extracted_data, f"{prefix}extracted_data_{file_index}.json", storage)
+
+    if table_index is not None:
+        table_index.add_page(file_index + 1, parsed_tables)
 
     processed_kv = process_checkboxes(parsed_kv, response)
-    matched_data = match_template(processed_kv, parsed_tables)
+    matched_data = match_template(processed_kv, parsed_tables, include_tables=table_index is None, template=template)
+    if zone_data:
+        matched_data = merge_zone_data(matched_data, zone_data)
 
     # Save matched data
-    save_intermediate_result(matched_data, f"matched_data_{file_index}.json")
+    save_intermediate_result(matched_data, f"{prefix}matched_data_{file_index}.json", storage)
 
     log_matching_results(matched_data)
 
@@ -60,36 +126,326 @@ def process_single_file(s3_file, file_index):
     logging.info(f"Processed file: {s3_file}")
     return final_result
 
-def upload_to_s3(file_path, bucket, object_name=None):
+@timed("Upload")
+def upload_to_s3(file_path, bucket, object_name=None, storage=None):
     if object_name is None:
         object_name = os.path.basename(file_path)
 
-    s3_client = boto3.client('s3',
-                             aws_access_key_id=AWS_ACCESS_KEY_ID,
-                             aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                             region_name=AWS_REGION)
+    storage = storage or S3Storage(bucket, s3_client)
 
     try:
-        s3_client.upload_file(file_path, bucket, object_name)
-        logging.info(f"File uploaded successfully to {bucket}/{object_name}")
+        storage.upload_file(file_path, object_name)
+        logging.info(f"File uploaded successfully to {storage.uri(object_name)}")
         return True
-    except ClientError as e:
+    except (ClientError, OSError) as e:
         logging.error(f"Error uploading file to S3: {e}")
         return False
     
-def save_result_to_s3(result, bucket, object_name):
+def save_result_to_s3(result, bucket, object_name, storage=None):
     """Save the final result to S3."""
+    storage = storage or S3Storage(bucket, s3_client)
     try:
-        logging.info(f"Saving final result to S3: {bucket}/{object_name}")
-        s3_client.put_object(Body=json.dumps(result, indent=2), Bucket=bucket, Key=object_name)
-        logging.info(f"Result saved to S3 as {bucket}/{object_name}")
+        logging.info(f"Saving final result to {storage.uri(object_name)}")
+        storage.put_object(object_name, json.dumps(result, indent=2))
+        logging.info(f"Result saved as {storage.uri(object_name)}")
         return True
-    except ClientError as e:
+    except (ClientError, OSError) as e:
         logging.error(f"Error saving result to S3: {e}")
         return False
 
+def export_result(result, source_key, template=None):
+    """Stage a document result for the columnar analytics export."""
+    sections, _ = split_template(template if template is not None else load_template())
+    stage_records(s3_storage, flatten_result(result, sections, source_key))
+
+def combine_results(results):
+    """Combine per-page results into a single document result."""
+    combined_result = {}
+    for result in results:
+        for key, value in result.items():
+            if key not in combined_result:
+                combined_result[key] = value
+            elif isinstance(value, dict):
+                combined_result[key].update(value)
+            elif isinstance(value, list):
+                combined_result[key].extend(value)
+            else:
+                if value:
+                    combined_result[key] = value
+    return combined_result
+
+def combine_document(results, table_index):
+    """Combine page results, then add the tables matched (and stitched) across the whole document."""
+    return combine_results(results + [post_process(table_index.matched_data())])
+
+def process_document(local_pdf_path, source_key, storage=None, textract_client=None, outputfolder=None, workspace=None,
+                     template=None):
+    """
+    Run the full pipeline for a local PDF.
+
+    Returns a tuple of (combined result, stats), where the result is None if no page
+    could be uploaded. The storage and Textract client default to the S3 bucket and
+    the real Textract service; the batch runner swaps them for offline backends.
+    With a workspace, page images are rendered into it and deleted once analyzed.
+    template is the full template, loaded with load_template() when omitted.
+    """
+    aliases.configure(storage or s3_storage)
+    results, table_index, decisions, stats = process_pages(local_pdf_path, source_key, storage, textract_client,
+                                                           outputfolder, workspace=workspace, template=template)
+    save_intermediate_result(build_triage_report(source_key, decisions),
+                             f"{document_id(source_key)}/triage_report.json", storage)
+    # Share the key aliases learned on this document with other containers and workers
+    aliases.save()
+    if results is None:
+        return None, stats
+
+    combined_result = combine_document(results, table_index)
+
+    logging.info("Processing completed. Final result:")
+    logging.info(json.dumps(combined_result, indent=2))
+    return combined_result, stats
+
+def process_pages(local_pdf_path, source_key, storage=None, textract_client=None, outputfolder=None, page_offset=0,
+                  workspace=None, document_key=None, template=None, page_limit=None):
+    """
+    Render, triage and analyze the pages of a local PDF, one page at a time.
+
+    Each page is rendered only when it is reached, so pages outside the template's page
+    range or after an early exit are never rendered. page_offset is the number of pages
+    preceding the PDF in its source document, so a fan-out chunk reports absolute page
+    numbers and its pages get the hints of their absolute page; document_key is then the
+    key of the whole document, which its response bundle is filed under. A chunk only
+    knows its own pages, so it does not stop early once the template is satisfied and
+    analyzes at most page_limit pages, its share of the document's limit (0 for none).
+    Without page_limit, the template's MaxPages hint or MAX_PAGES applies. The template
+    is loaded once here, when not given, and used for the hints and every page.
+    Returns a tuple of (page results, table index, triage decisions, stats), where the
+    results are None if no page could be uploaded.
+    """
+    storage = storage or s3_storage
+    document_name = document_id(source_key)
+    stats = {"pages": 0, "analyzed_pages": 0}
+
+    page_count = count_pages(local_pdf_path)
+    stats["pages"] = page_count
+    increment("Pages", page_count)
+
+    full_template = template if template is not None else load_template()
+    template, hints = split_template(full_template)
+
+    # Optional template page-range hint, e.g. "PageRange": [1, 3] (1-based, inclusive)
+    first_page, last_page = hints.get('PageRange') or (1, page_offset + page_count)
+    pages = [page for page in range(1, page_count + 1) if first_page <= page_offset + page <= last_page]
+    logging.info(f"Rendering up to {len(pages)} of {page_count} pages")
+    outputfolder = outputfolder or (workspace.folder("pdf_pages") if workspace else os.path.join("/tmp", "pdf_pages"))
+    page_files = iter_page_files(local_pdf_path, outputfolder, pages, on_page=workspace.track if workspace else None)
+
+    if page_limit is None:
+        page_limit = hints.get('MaxPages') or MAX_PAGES
+    early_exit = EARLY_EXIT_ENABLED and not document_key
+    progress = TemplateProgress(template, hints.get('RequiredFields')) if early_exit else None
+    table_index = TableIndex(template)
+    if not RAW_RESPONSES_ENABLED:
+        bundle = None
+    elif document_key:
+        bundle = ResponseBundle(document_key, full_template, page_offset + 1)
+    else:
+        bundle = ResponseBundle(source_key, full_template)
+    zone_extractor = ZoneExtractor(template, hints['Zones']) if ZONES_ENABLED and hints.get('Zones') else None
+
+    results = []
+    decisions = []
+    uploaded = 0
+    for pdf_page in pages:
+        page_number = page_offset + pdf_page
+        if page_limit and stats["analyzed_pages"] >= page_limit:
+            stats["stopped"] = f"page limit {page_limit} reached"
+            break
+        # A table still open at the bottom of the last page may continue on this one
+        if progress and progress.complete and not table_index.open_table:
+            stats["stopped"] = "template satisfied"
+            break
+
+        # The page is rendered here, only once it is known to be needed
+        with stage("Render"):
+            _, jpg_file = next(page_files)
+        # Triage the page locally so a blank page is skipped and the page requests only the features it needs
+        decision = triage_rendered_page(jpg_file, page_number, hints.get('PageFeatures'))
+        decisions.append(decision)
+
+        # Pages are uploaded just before analysis so pages skipped by an early exit are never uploaded
+        s3_object_name = f"textract_input/{document_name}/{os.path.basename(jpg_file)}"
+        analyzed = not decision['blank'] and upload_to_s3(jpg_file, storage.bucket, s3_object_name, storage)
+        if analyzed:
+            uploaded += 1
+            result = process_single_file(s3_object_name, page_number - 1, decision['feature_types'],
+                                         document_name, storage, textract_client, table_index, jpg_file,
+                                         local_pdf_path, bundle, zone_extractor, pdf_page, full_template)
+        if workspace:
+            # Analyzed, blank or not uploaded, the page image is done with; with pages rendered one at a
+            # time this keeps a single page in the workspace
+            workspace.release(jpg_file)
+        if not analyzed:
+            continue
+        stats["analyzed_pages"] += 1
+        increment("AnalyzedPages")
+        if result:
+            results.append(result)
+            if progress:
+                progress.update(result)
+                progress.update(table_index.matched_data())
+
+    page_files.close()
+
+    if "stopped" in stats:
+        logging.info(f"Stopped after {stats['analyzed_pages']} of {page_count} pages: {stats['stopped']}")
+    elif progress:
+        logging.info(f"Template fields still missing after all pages: {progress.missing}")
+
+    if not uploaded:
+        logging.error("No files were uploaded to S3. Exiting.")
+        return None, table_index, decisions, stats
+
+    if bundle is not None and bundle.pages:
+        bundle.save(storage)
+
+    return results, table_index, decisions, stats
+
+def process_chunk(task, storage=None, textract_client=None, outputfolder=None, workspace=None, template=None):
+    """
+    Worker side of the fan-out: run the per-page pipeline on one chunk of a document.
+
+    :param task: Chunk task with the 'key' of the chunk PDF in storage, the 'source_key'
+                 of the whole document, the chunk's 'first_page' and its 'page_limit'.
+    :return: Chunk payload with the page results, the parsed tables per page, the triage
+             decisions and stats, or with an 'error' if the chunk exceeded its workspace budget.
+    """
+    storage = storage or s3_storage
+    outputfolder = outputfolder or (workspace.path if workspace else "/tmp")
+    os.makedirs(outputfolder, exist_ok=True)
+    local_pdf_path = os.path.join(outputfolder, os.path.basename(task['key']))
+    aliases.configure(storage)
+    try:
+        storage.download_file(task['key'], local_pdf_path)
+        if workspace:
+            workspace.track(local_pdf_path)
+        # Named after the chunk so intermediate results, uploads and response bundles of concurrent chunks never collide
+        results, table_index, decisions, stats = process_pages(local_pdf_path, task['key'], storage, textract_client,
+                                                               os.path.join(outputfolder, "pdf_pages"),
+                                                               task['first_page'] - 1, workspace, task['source_key'],
+                                                               template, task.get('page_limit', 0))
+    except WorkspaceBudgetExceeded as e:
+        # The coordinator counts the chunk as failed; raising would make Lambda retry the whole chunk
+        logging.error(f"Error processing chunk {task['key']}: {e}")
+        return {"first_page": task['first_page'], "error": str(e)}
+    aliases.save()
+    return {
+        "first_page": task['first_page'],
+        "results": results or [],
+        "page_tables": table_index.page_tables,
+        "triage": decisions,
+        "stats": stats
+    }
+
+def reduce_chunks(payloads, template):
+    """
+    Merge chunk payloads, in page order, into one document result.
+
+    Tables are re-indexed across all chunks so a table continuing past a chunk boundary
+    is stitched exactly as in a single invocation. Returns a tuple of (combined result or
+    None if no chunk produced results, stats).
+    """
+    stats = {"pages": 0, "analyzed_pages": 0, "chunks": len(payloads), "failed_chunks": 0}
+    table_index = TableIndex(template)
+    results = []
+    for payload in sorted(payloads, key=lambda payload: payload.get("first_page", 0)):
+        if "error" in payload:
+            logging.error(f"Chunk failed: {payload['error']}")
+            stats["failed_chunks"] += 1
+            continue
+        results.extend(payload["results"])
+        # JSON turns the page-number keys into strings
+        for page_number, tables in sorted((int(page), tables) for page, tables in payload["page_tables"].items()):
+            table_index.add_page(page_number, tables)
+        stats["pages"] += payload["stats"].get("pages", 0)
+        stats["analyzed_pages"] += payload["stats"].get("analyzed_pages", 0)
+
+    if stats["failed_chunks"] == len(payloads):
+        return None, stats
+    return combine_document(results, table_index), stats
+
+@timed("FanOut")
+def process_document_fanout(local_pdf_path, source_key, dispatcher, storage=None, outputfolder=None, template=None):
+    """
+    Coordinator side of the fan-out: split a large PDF into page chunks, dispatch each
+    chunk to a worker and reduce the chunk payloads into the combined result.
+
+    The document's page limit (MaxPages hint or MAX_PAGES) is split across the chunks in
+    page order; chunks past the limit are not dispatched. The chunks' triage decisions
+    are saved as one report of the whole document.
+
+    :param dispatcher: LambdaDispatcher, or a LocalDispatcher running process_chunk in-process.
+    :return: Tuple of (combined result or None, stats), as process_document.
+    """
+    storage = storage or s3_storage
+    document_name = document_id(source_key)
+    full_template = template if template is not None else load_template()
+    sections, hints = split_template(full_template)
+    chunks = split_pdf(local_pdf_path, os.path.join(outputfolder or "/tmp", "pdf_chunks"))
+    page_limit = hints.get('MaxPages') or MAX_PAGES
+    limits = chunk_page_limits(chunks, page_limit, hints.get('PageRange'))
+
+    tasks = []
+    for chunk, limit in zip(chunks, limits):
+        if limit is None:
+            continue
+        chunk_key = f"{FANOUT_CHUNKS_PREFIX}{document_name}/{os.path.basename(chunk['path'])}"
+        if not upload_to_s3(chunk['path'], storage.bucket, chunk_key, storage):
+            continue
+        tasks.append({"key": chunk_key, "source_key": source_key, "first_page": chunk['first_page'],
+                      "last_page": chunk['last_page'], "page_limit": limit})
+    if not tasks:
+        logging.error("No chunks were uploaded to S3. Exiting.")
+        return None, {"pages": 0, "analyzed_pages": 0, "chunks": len(chunks)}
+
+    logging.info(f"Dispatching {len(tasks)} of {len(chunks)} chunks of {source_key}")
+    payloads = dispatcher.map(tasks)
+
+    combined_result, stats = reduce_chunks(payloads, sections)
+    if len(tasks) < len(chunks):
+        stats["pages"] = chunks[-1]['last_page']
+        stats["stopped"] = f"page limit {page_limit} reached"
+    decisions = [decision for payload in sorted(payloads, key=lambda payload: payload.get("first_page", 0))
+                 for decision in payload.get("triage", [])]
+    save_intermediate_result(build_triage_report(source_key, decisions),
+                             f"{document_name}/triage_report.json", storage)
+    logging.info(f"Reduced {stats['chunks']} chunks ({stats['failed_chunks']} failed) of {source_key}")
+    return combined_result, stats
+
 def lambda_handler(event, context):
     """AWS Lambda handler function."""
+    # Metrics can also be switched on per invocation with {"metrics": true, "profile": true} in the event
+    metrics.start_invocation(event.get('metrics'), event.get('profile'))
+    try:
+        return handle_event(event, context)
+    finally:
+        metrics.emit({"Function": getattr(context, 'function_name', 'local')})
+
+def handle_event(event, context):
+    """
+    Process the S3 object referenced by the event, a fan-out chunk sent by a coordinator, or
+    a scheduled {"compact_export": true} event compacting the staged analytics export.
+    """
+    if event.get('compact_export'):
+        compacted, written = compact_staging(s3_storage)
+        return {'statusCode': 200, 'body': json.dumps({'compacted': compacted, 'written': written})}
+
+    if 'chunk' in event:
+        chunk_name = os.path.splitext(os.path.basename(event['chunk']['key']))[0]
+        with Workspace(chunk_name) as workspace:
+            payload = process_chunk(event['chunk'], workspace=workspace)
+        return {'statusCode': 500 if 'error' in payload else 200, 'body': json.dumps(payload)}
+
     try:
         # Validate event structure and get bucket/key
         bucket = event['Records'][0]['s3']['bucket']['name']
@@ -99,57 +455,65 @@ def lambda_handler(event, context):
         logging.error(f"Error parsing event data: {e}")
         return {'statusCode': 400, 'body': json.dumps('Invalid event data')}
 
+    # All scratch files of this document live in its own workspace, removed even if processing fails
+    document_name = os.path.splitext(os.path.basename(key))[0]
+    object_size = event['Records'][0]['s3']['object'].get('size')
+    expected_bytes = object_size * WORKSPACE_EXPANSION_FACTOR if object_size else None
+    with Workspace(document_name, expected_bytes) as workspace:
+        return process_object(event, bucket, key, workspace)
+
+def process_object(event, bucket, key, workspace):
+    """
+    Download, process and save the result of the S3 object of an event inside its workspace.
+    A document whose scratch files exceed the workspace budget fails with a 500 response.
+    """
+    try:
+        return extract_object(event, bucket, key, workspace)
+    except WorkspaceBudgetExceeded as e:
+        # Returned rather than raised: an asynchronous S3 invocation that raises is retried,
+        # paying again for the pages already analyzed
+        logging.error(f"Error processing {bucket}/{key}: {e}")
+        return {'statusCode': 500, 'body': json.dumps('Document exceeds the workspace budget')}
+
+def extract_object(event, bucket, key, workspace):
+    """Download, process and save the result of the S3 object of an event inside its workspace."""
     # Download the file from S3
     try:
-        local_pdf_path = os.path.join("/tmp", os.path.basename(key))
-        s3_client.download_file(bucket, key, local_pdf_path)
+        local_pdf_path = workspace.file(os.path.basename(key))
+        with stage("Download"):
+            s3_client.download_file(bucket, key, local_pdf_path)
+        workspace.track(local_pdf_path)
         logging.info(f"Downloaded file from S3: {bucket}/{key}")
     except ClientError as e:
         logging.error(f"Error downloading file from S3: {e}")
         return {'statusCode': 500, 'body': json.dumps('Error downloading file from S3')}
 
-    # Process the document
-    jpg_files = prepare_document(local_pdf_path)
-    logging.info(f"Prepared {len(jpg_files)} JPG files")
-
-    s3_files = []
-    for jpg_file in jpg_files:
-        s3_object_name = f"textract_input/{os.path.basename(jpg_file)}"
-        if upload_to_s3(jpg_file, BUCKET, s3_object_name):
-            s3_files.append(s3_object_name)
+    # One template for the whole document, so its hints, page matching and export agree
+    template = load_template()
 
-    if not s3_files:
-        logging.error("No files were uploaded to S3. Exiting.")
+    # Process the document, fanning large documents out to worker invocations
+    if FANOUT_ENABLED and FANOUT_FUNCTION_NAME and count_pages(local_pdf_path) > FANOUT_MIN_PAGES:
+        combined_result, _ = process_document_fanout(local_pdf_path, key, LambdaDispatcher(FANOUT_FUNCTION_NAME),
+                                                     outputfolder=workspace.path, template=template)
+    else:
+        combined_result, _ = process_document(local_pdf_path, key, workspace=workspace, template=template)
+    if combined_result is None:
         return {'statusCode': 500, 'body': json.dumps('No files were uploaded to S3.')}
 
-    results = []
-    for index, s3_file in enumerate(s3_files):
-        result = process_single_file(s3_file, index)
-        if result:
-            results.append(result)
-
-    # Combine results from all pages
-    combined_result = {}
-    for result in results:
-        for key, value in result.items():
-            if key not in combined_result:
-                combined_result[key] = value
-            elif isinstance(value, dict):
-                combined_result[key].update(value)
-            elif isinstance(value, list):
-                combined_result[key].extend(value)
-            else:
-                if value:
-                    combined_result[key] = value
-
-    logging.info("Processing completed. Final result:")
-    logging.info(json.dumps(combined_result, indent=2))
-
     # Save results
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     result_filename = f"extraction_result_{timestamp}.json"
     s3_result_object_name = f"extraction_results/{result_filename}"
-    save_result_to_s3(combined_result, BUCKET, s3_result_object_name)
+    with stage("SaveResult"):
+        saved = save_result_to_s3(combined_result, BUCKET, s3_result_object_name)
+
+    if saved and INDEX_ENABLED:
+        etag = event['Records'][0]['s3']['object'].get('eTag') or file_etag(local_pdf_path)
+        write_segment(s3_storage, [index_entry(combined_result, s3_storage.uri(s3_result_object_name),
+                                               f"s3://{bucket}/{key}", etag)])
+
+    if EXPORT_ENABLED:
+        export_result(combined_result, key, template)
 
     return {'statusCode': 200, 'body': json.dumps('Document processed successfully.')}
 
@@ -0,0 +1,91 @@
+"""
+Builds and queries the local SQLite index of extraction results.
+
+Every saved result leaves a small index segment under INDEX_PREFIX. 'sync' merges the
+segments not yet merged into a local index file, 'merge' folds in index files written by
+other runs (e.g. batch_runner.py --index), and 'query' looks results up by meter,
+operator or production date without listing the bucket.
+
+Examples:
+    python query_index.py sync results.sqlite
+    python query_index.py sync results.sqlite --source out/
+    python query_index.py merge results.sqlite backfill_2023.sqlite backfill_2024.sqlite
+    python query_index.py query results.sqlite --meter 12345 --from 2024-01-01
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+
+def open_segments(source=None):
+    """
+    Opens the storage holding index segments.
+    :param source: Local output directory or s3://bucket/prefix; defaults to the configured bucket.
+    :return: Tuple of (storage, segment prefix).
+    """
+    from src.storage import S3Storage, LocalStorage, parse_s3_uri
+    from src.result_index import SEGMENTS_PREFIX
+    from config import BUCKET
+    if source is None:
+        return S3Storage(BUCKET), SEGMENTS_PREFIX
+    if source.startswith('s3://'):
+        bucket, prefix = parse_s3_uri(source)
+        return S3Storage(bucket), prefix or SEGMENTS_PREFIX
+    return LocalStorage(source), SEGMENTS_PREFIX
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the extraction result index.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sync = commands.add_parser('sync', help="Merge new index segments into an index file")
+    sync.add_argument('index', help="SQLite index file")
+    sync.add_argument('--source', help="Local output directory or s3://bucket/prefix of segments")
+
+    merge = commands.add_parser('merge', help="Merge other index files into an index file")
+    merge.add_argument('index', help="SQLite index file")
+    merge.add_argument('others', nargs='+', help="Index files to merge")
+
+    query = commands.add_parser('query', help="Look up indexed results")
+    query.add_argument('index', help="SQLite index file")
+    query.add_argument('--meter', help="Meter #")
+    query.add_argument('--operator', help="Operator (case-insensitive)")
+    query.add_argument('--date', help="Production date")
+    query.add_argument('--from', dest='date_from', help="Earliest production date")
+    query.add_argument('--to', dest='date_to', help="Latest production date")
+    query.add_argument('--source', help="Source PDF location")
+    query.add_argument('--limit', type=int, help="Return at most this many results")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # A local lookup tool; keep logs local unless asked otherwise (set before the pipeline modules are imported)
+    os.environ.setdefault('CLOUDWATCH_LOGS', 'false')
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    from src.result_index import ResultIndex
+
+    if args.command == 'query' and not os.path.exists(args.index):
+        print(f"Index file {args.index} does not exist; run 'sync' first", file=sys.stderr)
+        return 1
+
+    with ResultIndex(args.index) as index:
+        if args.command == 'sync':
+            storage, prefix = open_segments(args.source)
+            merged = index.sync(storage, prefix)
+            print(f"Merged {merged} segments; {index.count()} results indexed")
+        elif args.command == 'merge':
+            for other in args.others:
+                index.merge(other)
+            print(f"{index.count()} results indexed")
+        else:
+            started = time.perf_counter()
+            results = index.query(args.meter, args.operator, args.date, args.date_from, args.date_to,
+                                  args.source, args.limit)
+            for result in results:
+                print(json.dumps(result))
+            print(f"{len(results)} results in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
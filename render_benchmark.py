@@ -0,0 +1,100 @@
+"""
+Benchmarks the page rendering backends.
+
+Each backend runs in a fresh subprocess so start-up cost (e.g. the JVM behind pdf2jpg)
+and peak memory are measured in isolation. Peak RSS includes child processes.
+
+Examples:
+    python render_benchmark.py statement.pdf
+    python render_benchmark.py statement.pdf --backends pypdfium2 --dpi 200 --repeat 3
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / 1024, 1)
+
+def run_backend(backend, pdf_file, dpi, mode):
+    """
+    Renders every page of a PDF with one backend, in this process.
+    :param mode: 'disk' renders JPG files with the renderer's render(); 'memory' iterates pages lazily.
+    :return: Measurement dictionary.
+    """
+    os.environ['CLOUDWATCH_LOGS'] = 'false'
+    from src.document_preparation import RENDERERS
+
+    renderer = RENDERERS[backend][0]()
+    outputfolder = tempfile.mkdtemp(prefix='render_benchmark_')
+    started = time.perf_counter()
+    try:
+        if mode == 'disk':
+            pages = len(renderer.render(pdf_file, outputfolder, dpi))
+        else:
+            pages = 0
+            for _, image in renderer.iter_pages(pdf_file, dpi):
+                image.close()
+                pages += 1
+    finally:
+        shutil.rmtree(outputfolder, ignore_errors=True)
+    if not pages:
+        raise RuntimeError(f"{backend} rendered no pages")
+    seconds = time.perf_counter() - started
+    return {
+        "backend": backend,
+        "mode": mode,
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "seconds_per_page": round(seconds / pages, 3),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark render time and peak memory of the render backends.")
+    parser.add_argument('pdf', help="PDF to render")
+    parser.add_argument('--backends', nargs='+', default=['pdf2jpg', 'pypdfium2'], help="Backends to compare")
+    parser.add_argument('--modes', nargs='+', default=['disk', 'memory'], choices=['disk', 'memory'])
+    parser.add_argument('--dpi', type=int, default=300, help="Rendering resolution")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per backend and mode")
+    parser.add_argument('--run', nargs=2, metavar=('BACKEND', 'MODE'), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.run:
+        print(json.dumps(run_backend(args.run[0], args.pdf, args.dpi, args.run[1])))
+        return 0
+
+    results = []
+    for backend in args.backends:
+        for mode in args.modes:
+            for _ in range(args.repeat):
+                process = subprocess.run([sys.executable, os.path.abspath(__file__), args.pdf, '--dpi', str(args.dpi),
+                                          '--run', backend, mode],
+                                         capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+                if process.returncode != 0:
+                    results.append({"backend": backend, "mode": mode,
+                                    "error": (process.stderr.strip().splitlines() or ['unknown error'])[-1]})
+                    continue
+                results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+    for result in results:
+        if "error" in result:
+            print(f"{result['backend']:<10} {result['mode']:<7} failed: {result['error']}")
+        else:
+            print(f"{result['backend']:<10} {result['mode']:<7} {result['pages']:>4} pages  "
+                  f"{result['seconds']:>8.3f}s  {result['seconds_per_page']:>6.3f}s/page  "
+                  f"peak RSS {result['peak_rss_mb']:>7.1f} MB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
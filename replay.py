@@ -0,0 +1,236 @@
+"""
+Replays persisted Textract responses through the extraction pipeline.
+
+Every processed document leaves a gzip-compressed bundle of its raw AnalyzeDocument
+responses, plus the DetectDocumentText responses its template zones were read from,
+under RAW_RESPONSES_PREFIX. This tool re-derives results from those bundles
+without calling Textract, so a template or parsing change can be applied to the
+archive at the cost of CPU only. Per-page results are cached on disk keyed by
+(response, template version, pipeline version); re-running with unchanged code and
+template only recombines cached pages. The chunk bundles of a fanned-out document
+are replayed together, so tables crossing chunk boundaries are stitched as in the
+original run.
+
+Low-confidence refinement is not replayed: it re-reads page crops, which are not part
+of the bundle. Nor is the learned key alias table used, so a replayed result depends on
+nothing but the bundle, the template and the pipeline code.
+
+Examples:
+    python replay.py s3://starwarsbff/raw_responses/ --output-dir replayed/
+    python replay.py bundles/ --template new_template.json --workers 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Per-process replay settings, set up once by init_worker
+_bundle_storage = None
+_cache_dir = None
+_template = None
+_force = False
+
+def open_source(source):
+    """
+    Opens the storage holding the response bundles.
+    :param source: Local directory or s3://bucket/prefix of bundles.
+    :return: Tuple of (storage, sorted list of bundle keys).
+    """
+    from src.storage import S3Storage, LocalStorage, parse_s3_uri
+    if source.startswith('s3://'):
+        bucket, prefix = parse_s3_uri(source)
+        storage = S3Storage(bucket)
+    else:
+        storage, prefix = LocalStorage(source), ''
+    return storage, sorted(key for key in storage.list_keys(prefix) if key.endswith('.json.gz'))
+
+def group_bundles(keys):
+    """
+    Groups bundle keys by document, so the chunk bundles of a fanned-out document form one group.
+    :return: List of bundle key lists, one per document.
+    """
+    from src.response_store import document_bundle_key
+    groups = {}
+    for key in keys:
+        groups.setdefault(document_bundle_key(key), []).append(key)
+    return list(groups.values())
+
+def load_replay_template(template_path=None):
+    """Loads the template to replay against: a local JSON file, or the deployed template."""
+    if template_path:
+        with open(template_path, 'r') as file:
+            return json.load(file)
+    from src.template_matching import load_template
+    return load_template()
+
+def init_worker(source, cache_dir, template_path, force):
+    """Configures the bundle storage, cache and template of a worker process."""
+    global _bundle_storage, _cache_dir, _template, _force
+    # Cached pages are keyed by response, template and pipeline code only, so matching must not
+    # depend on the learned alias table (which would also be read from the deployed bucket)
+    from src.key_aliases import aliases
+    aliases.enabled = False
+    _bundle_storage, _ = open_source(source)
+    _cache_dir = cache_dir
+    _template = load_replay_template(template_path)
+    _force = force
+
+def page_cache_key(page, versions):
+    from src.response_store import fingerprint
+    return fingerprint({"response": fingerprint(page["response"]),
+                        "text_response": fingerprint(page.get("text_response")), **versions})
+
+def read_cache(key):
+    path = os.path.join(_cache_dir, key[:2], f"{key}.json")
+    if _force or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except ValueError:
+        return None
+
+def write_cache(key, entry):
+    directory = os.path.join(_cache_dir, key[:2])
+    os.makedirs(directory, exist_ok=True)
+    # Write then rename so concurrent workers never read a partial entry
+    temp_path = os.path.join(directory, f".{key}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as file:
+        json.dump(entry, file)
+    os.replace(temp_path, os.path.join(directory, f"{key}.json"))
+
+def derive_page(page, template):
+    """
+    Runs the recorded responses of one page through zone extraction, parsing, matching and post-processing.
+    :param page: Bundle page with its AnalyzeDocument 'response' (None for a zone-only page) and,
+                 for a page read through template zones, its DetectDocumentText 'text_response'.
+    :return: Dictionary with the page 'result' and its parsed 'tables' for the document-wide table index.
+    """
+    from src.response_parser import parse_response
+    from src.document_specific_processing import process_checkboxes
+    from src.template_matching import match_template, split_template
+    from src.zone_extraction import ZoneExtractor, merge_zone_data
+    from src.post_processing import post_process
+
+    zone_data = {}
+    sections, hints = split_template(template)
+    if page.get("text_response") and hints.get('Zones'):
+        zone_data, _ = ZoneExtractor(sections, hints['Zones']).extract(page["text_response"], page["page"])
+    response = page["response"]
+    if response is None:
+        return {"result": post_process(zone_data), "tables": []}
+
+    parsed_kv, parsed_tables = parse_response(response)
+    processed_kv = process_checkboxes(parsed_kv, response)
+    matched_data = match_template(processed_kv, parsed_tables, include_tables=False, template=template)
+    if zone_data:
+        matched_data = merge_zone_data(matched_data, zone_data)
+    return {"result": post_process(matched_data), "tables": parsed_tables}
+
+def replay_bundle(keys):
+    """
+    Re-derives the result of one document from its response bundles in a worker process.
+    :param keys: Keys of the document's bundle, or of all its chunk bundles, in the source storage.
+    :return: Tuple of (replay record, combined result or None).
+    """
+    from lambda_function import combine_document
+    from src.response_store import load_bundle, template_version, pipeline_version
+    from src.template_matching import split_template
+    from src.table_index import TableIndex
+    from src.metrics import increment
+
+    started = time.perf_counter()
+    record = {"bundle": keys[0], "status": "error", "pages": 0, "cached_pages": 0}
+    if len(keys) > 1:
+        record["chunks"] = len(keys)
+    try:
+        bundles = [load_bundle(_bundle_storage, key) for key in keys]
+        bundle = bundles[0]
+        versions = {"template": template_version(_template), "pipeline": pipeline_version()}
+        template, _ = split_template(_template)
+        table_index = TableIndex(template)
+        results = []
+        # Chunk bundles record absolute page numbers, so their pages merge into document order
+        pages = [page for chunk in bundles for page in chunk["pages"]]
+        for page in sorted(pages, key=lambda page: page["page"]):
+            cache_key = page_cache_key(page, versions)
+            entry = read_cache(cache_key)
+            if entry is None:
+                entry = derive_page(page, _template)
+                write_cache(cache_key, entry)
+            else:
+                record["cached_pages"] += 1
+                increment("CacheHits")
+            table_index.add_page(page["page"], entry["tables"])
+            results.append(entry["result"])
+            record["pages"] += 1
+
+        record.update(status="ok", document=bundle["document"],
+                      recorded_template_version=bundle.get("template_version"), **versions)
+        result = combine_document(results, table_index)
+    except Exception as e:
+        logging.error(f"Error replaying {keys[0]}: {e}", exc_info=True)
+        record["error"] = str(e)
+        result = None
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record, result
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-derive extraction results from persisted Textract responses.")
+    parser.add_argument('source', help="Directory or s3://bucket/prefix of response bundles")
+    parser.add_argument('--output-dir', default='replayed', help="Directory the replayed results are written to")
+    parser.add_argument('--cache', default='.replay_cache', help="Directory of cached per-page results")
+    parser.add_argument('--template', help="Template JSON file to replay against instead of the deployed template")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument('--force', action='store_true', help="Ignore cached page results")
+    parser.add_argument('--summary', help="Also write the replay summary to this JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from src.storage import document_id
+
+    _, keys = open_source(args.source)
+    groups = group_bundles(keys)
+    logging.info(f"{len(keys)} response bundles of {len(groups)} documents found")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    records = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(args.source, args.cache, args.template, args.force)) as pool:
+        futures = [pool.submit(replay_bundle, group) for group in groups]
+        for future in as_completed(futures):
+            record, result = future.result()
+            if result is not None:
+                output_path = os.path.join(args.output_dir, f"extraction_result_{document_id(record['document'])}.json")
+                with open(output_path, 'w') as file:
+                    json.dump(result, file, indent=2)
+                record["result"] = output_path
+            records.append(record)
+            logging.info(f"[{len(records)}/{len(groups)}] {record['bundle']}: {record['status']} "
+                         f"({record['cached_pages']}/{record['pages']} pages cached, {record['seconds']}s)")
+
+    elapsed = time.perf_counter() - started
+    pages = sum(r['pages'] for r in records)
+    summary = {
+        "documents": len(records),
+        "succeeded": sum(1 for r in records if r['status'] == 'ok'),
+        "failed": sum(1 for r in records if r['status'] != 'ok'),
+        "pages": pages,
+        "cached_pages": sum(r['cached_pages'] for r in records),
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else 0.0
+    }
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, 'w') as file:
+            json.dump(summary, file, indent=2)
+    return 0 if summary['failed'] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+import io
+import re
+import gzip
+import json
+import time
+import uuid
+import logging
+import watchtower
+from datetime import datetime
+from config import CLOUDWATCH_LOGS, EXPORT_PREFIX, EXPORT_FORMAT, EXPORT_MAX_RECORDS, EXPORT_MAX_AGE_SECONDS
+from src.post_processing import float_correction
+from src.template_matching import template_field_paths, resolve_path
+from src.table_index import normalize_cell, header_signature
+from src.metrics import timed, increment
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+# pyarrow is optional; without it Parquet exports fall back to compressed NDJSON
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Lambda invocations stage one object per document here; compact_staging turns them into columnar objects.
+# The leading underscore keeps Hive-style readers of EXPORT_PREFIX from treating it as a table.
+STAGING_PREFIX = f"{EXPORT_PREFIX}_staging/"
+
+# Record type for each exported table, keyed by template field path
+TABLE_RECORD_TYPES = {
+    "Physical Information/Volumes": "volumes",
+    "Analysis": "analysis_components",
+    "Fees": "fees",
+    "Settlement Information/Plant Products": "plant_products",
+    "Settlement Information/Residue Gas": "residue_gas"
+}
+
+def column_name(name):
+    """
+    Converts a template key into a column name, e.g. 'Meter #' -> 'meter_no', 'Producer %' -> 'producer_pct'.
+    :param name: Template key.
+    :return: Snake-case column name.
+    """
+    name = name.replace('#', ' no ').replace('%', ' pct ')
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+def is_text_column(index, name):
+    return index == 0 or 'unit' in name.lower()
+
+def table_rows(table):
+    """
+    Unwraps a post-processed table ([{"value": [cells]}, ...]) into a list of rows.
+    """
+    return [item.get("value") if isinstance(item, dict) else item for item in table]
+
+def flatten_table(table, spec, keys):
+    """
+    Converts a post-processed table into typed records.
+    :param table: Post-processed table.
+    :param spec: Template table spec (TableName and ColumnNames).
+    :param keys: Document key columns added to every record.
+    :return: List of record dictionaries.
+    """
+    column_names = spec.get('ColumnNames', [])
+    rows = [row for row in table_rows(table) if isinstance(row, list) and any(row)]
+    # Drop the leading title row ('Volumes') and header row ('Description', 'Mcf', ...)
+    title = normalize_cell(spec.get('TableName'))
+    if rows and normalize_cell(rows[0][0]) == title and not any(rows[0][1:]):
+        rows = rows[1:]
+    if rows and header_signature(rows[0]) == header_signature(column_names[:len(rows[0])]):
+        rows = rows[1:]
+
+    records = []
+    for row in rows:
+        record = dict(keys)
+        for index, cell in enumerate(row):
+            name = column_names[index] if index < len(column_names) else f"column_{index + 1}"
+            if is_text_column(index, name):
+                record[column_name(name)] = cell
+            else:
+                value = float_correction(cell) if cell else None
+                record[column_name(name)] = value if isinstance(value, float) else None
+        records.append(record)
+    return records
+
+def flatten_result(result, template, source_key):
+    """
+    Flattens a post-processed document result into typed columnar records.
+    :param result: Combined post-processed result of a document.
+    :param template: Template sections (without hints).
+    :param source_key: S3 key of the source PDF.
+    :return: Dictionary mapping record types to lists of records.
+    """
+    keys = {
+        "source_key": source_key,
+        "meter_no": resolve_path(result, "Statement/Meter #"),
+        "operator": resolve_path(result, "Statement/Operator"),
+        "production_date": resolve_path(result, "Statement/Production Date")
+    }
+
+    statement = {"source_key": source_key}
+    records = {"statements": [statement]}
+    for path in template_field_paths(template):
+        spec = resolve_path(template, path)
+        value = resolve_path(result, path)
+        if isinstance(spec, dict) and 'TableName' in spec:
+            if path in TABLE_RECORD_TYPES and isinstance(value, list):
+                records[TABLE_RECORD_TYPES[path]] = flatten_table(value, spec, keys)
+        else:
+            statement[column_name(path.split('/')[-1])] = value
+    return records
+
+def partition_path(production_date, operator):
+    """
+    Builds the Hive-style partition of a document, e.g. 'production_date=2024-01-31/operator=acme_gas'.
+    """
+    date = 'unknown'
+    if isinstance(production_date, str) and re.match(r'^\d{4}-\d{2}-\d{2}$', production_date):
+        date = production_date
+    operator = column_name(operator) if isinstance(operator, str) and column_name(operator) else 'unknown'
+    return f"production_date={date}/operator={operator}"
+
+class ColumnarExportBuffer:
+    """
+    Buffers flattened records and writes them as compressed NDJSON (or Parquet) objects,
+    one per record type and partition, when the buffer is large or old enough.
+    """
+
+    def __init__(self, storage, prefix=EXPORT_PREFIX, file_format=EXPORT_FORMAT,
+                 max_records=EXPORT_MAX_RECORDS, max_age_seconds=EXPORT_MAX_AGE_SECONDS):
+        if file_format == 'parquet' and pyarrow is None:
+            logger.warning("pyarrow is not installed; exporting compressed NDJSON instead of Parquet")
+            file_format = 'ndjson'
+        self.storage = storage
+        self.prefix = prefix
+        self.file_format = file_format
+        self.max_records = max_records
+        self.max_age_seconds = max_age_seconds
+        self.groups = {}
+        self.record_count = 0
+        self.oldest = None
+
+    def add(self, records):
+        """
+        Adds the flattened records of one document.
+        :param records: Dictionary mapping record types to lists of records.
+        """
+        statement = records["statements"][0]
+        partition = partition_path(statement.get("production_date"), statement.get("operator"))
+        for record_type, rows in records.items():
+            self.groups.setdefault((record_type, partition), []).extend(rows)
+            self.record_count += len(rows)
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+
+    def is_due(self):
+        if not self.record_count:
+            return False
+        return (self.record_count >= self.max_records or
+                time.monotonic() - self.oldest >= self.max_age_seconds)
+
+    def flush_if_due(self):
+        """Flushes the buffer when it exceeds its size or age limit."""
+        if self.is_due():
+            return self.flush()
+        return []
+
+    def encode(self, rows):
+        if self.file_format == 'parquet':
+            output = io.BytesIO()
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), output, compression='snappy')
+            return output.getvalue(), 'parquet'
+        body = '\n'.join(json.dumps(row, default=str) for row in rows) + '\n'
+        return gzip.compress(body.encode('utf-8')), 'ndjson.gz'
+
+    @timed("ColumnarExport")
+    def flush(self):
+        """
+        Writes every buffered group as one object.
+        :return: List of written object keys.
+        """
+        written = []
+        failed = {}
+        batch = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        for (record_type, partition), rows in self.groups.items():
+            if not rows:
+                continue
+            key = f"{self.prefix}{record_type}/{partition}/part-{batch}"
+            try:
+                body, extension = self.encode(rows)
+                key = f"{key}.{extension}"
+                self.storage.put_object(key, body)
+                written.append(key)
+                increment("ExportedRecords", len(rows))
+            except Exception as e:
+                # Keep the rows buffered so the next flush retries them
+                logger.error(f"Error writing columnar export {key}: {e}", exc_info=True)
+                failed[(record_type, partition)] = rows
+        logger.info(f"Flushed {self.record_count} records into {len(written)} columnar objects")
+        self.groups = failed
+        self.record_count = sum(len(rows) for rows in failed.values())
+        self.oldest = time.monotonic() if failed else None
+        return written
+
+@timed("StageExport")
+def stage_records(storage, records):
+    """
+    Writes the flattened records of one document as a single staging object. A Lambda
+    container can be frozen at any time, so it cannot hold records in memory; staged
+    documents are compacted into columnar objects later by compact_staging.
+    :param records: Dictionary mapping record types to lists of records.
+    :return: Key of the staging object, or None if writing failed.
+    """
+    key = f"{STAGING_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}.json.gz"
+    try:
+        storage.put_object(key, gzip.compress(json.dumps(records, default=str).encode('utf-8')))
+        increment("StagedExports")
+        return key
+    except Exception as e:
+        logger.error(f"Error staging columnar export {key}: {e}", exc_info=True)
+        return None
+
+@timed("CompactExport")
+def compact_staging(storage, prefix=STAGING_PREFIX, max_records=EXPORT_MAX_RECORDS):
+    """
+    Compacts staged documents into columnar objects, one per record type and partition
+    for every max_records records, and deletes the staging objects once their records are
+    written. If a write fails, the staging objects of that batch are kept for the next
+    run. Meant to run on a schedule (see lambda_function.handle_event).
+    :return: Tuple of (number of staging objects compacted, list of written object keys).
+    """
+    buffer = ColumnarExportBuffer(storage, max_records=max_records)
+    keys = sorted(storage.list_keys(prefix))
+    compacted, written, staged = 0, [], []
+    for position, key in enumerate(keys, start=1):
+        buffer.add(json.loads(gzip.decompress(storage.get_object(key))))
+        staged.append(key)
+        if buffer.record_count < max_records and position < len(keys):
+            continue
+        written.extend(buffer.flush())
+        if buffer.record_count:
+            logger.error(f"Keeping {len(staged)} staged documents after a failed columnar write")
+            break
+        for staged_key in staged:
+            storage.delete_object(staged_key)
+        compacted += len(staged)
+        staged = []
+    logger.info(f"Compacted {compacted} staged documents into {len(written)} columnar objects")
+    return compacted, written
+
+# Log a message when the module is loaded
+logger.info("Columnar export module loaded successfully")
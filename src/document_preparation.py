@@ -1,33 +1,170 @@
 import os
-import boto3
-from PyPDF2 import PdfReader
-from pdf2jpg import pdf2jpg
-from config import BUCKET, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION
-
-def prepare_document(pdf_file):
-    # Use /tmp for temporary storage in Lambda
-    outputfolder = os.path.join("/tmp", "pdf_pages")
-    os.makedirs(outputfolder, exist_ok=True)
+import logging
+import watchtower
+from config import CLOUDWATCH_LOGS, RENDER_BACKEND, RENDER_DPI, RENDER_JPEG_QUALITY
+from src.metrics import timed
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+# Both renderers are optional; get_renderer falls back to whichever one is installed
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+try:
+    from pdf2jpg import pdf2jpg
+except ImportError:
+    pdf2jpg = None
+
+def page_sort_key(jpgfile):
+    index, _, name = os.path.basename(jpgfile).partition('_')
+    return (int(index), name) if index.isdigit() else (float('inf'), os.path.basename(jpgfile))
+
+class Pdf2JpgRenderer:
+    """
+    Renders pages with pdf2jpg, which runs a Java jar in a subprocess and writes every
+    requested page to disk. Needs a JRE.
+    """
+    name = 'pdf2jpg'
+
+    def render(self, pdf_file, outputfolder, dpi=RENDER_DPI, pages=None, on_page=None):
+        """
+        Renders pages of a PDF to JPG files.
+        :param pdf_file: Path of the PDF.
+        :param outputfolder: Folder for the rendered images.
+        :param dpi: Rendering resolution.
+        :param pages: 1-based page numbers to render, or None for all pages.
+        :param on_page: Called with the path of each rendered JPG (e.g. Workspace.track).
+        :return: Paths of the rendered JPGs in page order.
+        """
+        # pdf2jpg page numbers are 0-based, matching the index prefix of its output files
+        selection = "ALL" if pages is None else ','.join(str(page - 1) for page in pages)
+        result = pdf2jpg.convert_pdf2jpg(pdf_file, outputfolder, dpi=dpi, pages=selection)
+        # Use the files reported for this document; the output folder may hold other documents' pages
+        jpgfiles = result[0]['output_jpgfiles'] if result else []
+        # pdf2jpg names pages '<index>_<name>.jpg'; sort numerically so page 10 follows page 9
+        jpgfiles = sorted(jpgfiles, key=page_sort_key)
+        # pdf2jpg writes every page before returning, so pages can only be reported afterwards
+        for jpgfile in jpgfiles:
+            if on_page:
+                on_page(jpgfile)
+        return jpgfiles
 
-    filename = os.path.splitext(os.path.basename(pdf_file))[0]
+    def iter_pages(self, pdf_file, dpi=RENDER_DPI, pages=None):
+        """
+        Yields (1-based page number, PIL image) for the given pages, or every page. pdf2jpg
+        cannot render lazily, so the pages are rendered to a temporary folder first.
+        """
+        import tempfile
+        from PIL import Image
+        with tempfile.TemporaryDirectory(prefix='pdf2jpg_') as outputfolder:
+            for jpgfile in self.render(pdf_file, outputfolder, dpi, pages):
+                # The 0-based page index prefixes each file name
+                page_number = page_sort_key(jpgfile)[0] + 1
+                with Image.open(jpgfile) as image:
+                    image.load()
+                    yield page_number, image
 
-    # Convert PDF to JPG
-    result = pdf2jpg.convert_pdf2jpg(pdf_file, outputfolder, pages="ALL")
+class PdfiumRenderer:
+    """
+    Renders pages in-process with PDFium (pypdfium2), one page at a time and straight
+    into memory; no JVM and no subprocess.
+    """
+    name = 'pypdfium2'
 
-    # Get JPG files
-    jpgfolder = [x[0] for x in os.walk(outputfolder)][1]
-    jpgfiles = [os.path.join(jpgfolder, entry) for entry in os.listdir(jpgfolder)]
-    jpgfiles.sort()
+    def iter_pages(self, pdf_file, dpi=RENDER_DPI, pages=None):
+        """
+        Lazily renders pages of a PDF.
+        :param pdf_file: Path of the PDF.
+        :param dpi: Rendering resolution.
+        :param pages: 1-based page numbers to render, or None for all pages.
+        :return: Generator of (1-based page number, PIL image); each page is rendered when requested.
+        """
+        pdf = pypdfium2.PdfDocument(pdf_file)
+        try:
+            for page_number in pages if pages is not None else range(1, len(pdf) + 1):
+                page = pdf[page_number - 1]
+                try:
+                    bitmap = page.render(scale=dpi / 72)
+                    image = bitmap.to_pil()
+                    bitmap.close()
+                finally:
+                    page.close()
+                yield page_number, image
+        finally:
+            pdf.close()
 
-    # Upload to S3
-    s3 = boto3.client('s3', 
-                      aws_access_key_id=AWS_ACCESS_KEY_ID,
-                      aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                      region_name=AWS_REGION)
+    def render(self, pdf_file, outputfolder, dpi=RENDER_DPI, pages=None, on_page=None):
+        """
+        Renders pages of a PDF to JPG files, one page in memory at a time.
+        on_page is called with each JPG as soon as it is written.
+        :return: Paths of the rendered JPGs in page order.
+        """
+        return [jpgfile for _, jpgfile in iter_page_files(pdf_file, outputfolder, pages, dpi, self, on_page)]
 
-    for jpgfile in jpgfiles:
-        jpgfilename = os.path.basename(jpgfile)
-        s3.upload_file(jpgfile, BUCKET, f'{filename}/{jpgfilename}')
-    
-    print(f"jpg files", jpgfiles)
-    return jpgfiles
+RENDERERS = {
+    Pdf2JpgRenderer.name: (Pdf2JpgRenderer, lambda: pdf2jpg is not None),
+    PdfiumRenderer.name: (PdfiumRenderer, lambda: pypdfium2 is not None)
+}
+
+def get_renderer(name=RENDER_BACKEND):
+    """
+    Returns the rendering backend called name, or the other backend if it is not installed.
+    """
+    renderer_class, available = RENDERERS[name]
+    if not available():
+        fallback = next(other for other in RENDERERS if other != name)
+        logger.warning(f"Render backend '{name}' is not installed; using '{fallback}'")
+        renderer_class, _ = RENDERERS[fallback]
+    return renderer_class()
+
+def iter_page_images(pdf_file, dpi=RENDER_DPI, renderer=None, pages=None):
+    """
+    Lazily renders a PDF into memory, page by page.
+    :return: Generator of (1-based page number, PIL image).
+    """
+    return (renderer or get_renderer()).iter_pages(pdf_file, dpi, pages)
+
+def iter_page_files(pdf_file, outputfolder, pages=None, dpi=RENDER_DPI, renderer=None, on_page=None):
+    """
+    Lazily renders pages of a PDF to JPG files: each page is rendered only when the
+    generator is advanced, so a caller that stops early never renders the remaining pages
+    and one that deletes each file after use holds a single page on disk.
+    Files are named like pdf2jpg's ('<0-based index>_<name>.jpg') in a folder per document.
+    :param pages: 1-based page numbers to render, or None for all pages.
+    :param on_page: Called with the path of each JPG as soon as it is written (e.g. Workspace.track).
+    :return: Generator of (1-based page number, JPG path).
+    """
+    name = os.path.basename(pdf_file)
+    jpgfolder = os.path.join(outputfolder, f"{name}_dir")
+    os.makedirs(jpgfolder, exist_ok=True)
+    for page_number, image in iter_page_images(pdf_file, dpi, renderer, pages):
+        jpgfile = os.path.join(jpgfolder, f"{page_number - 1}_{name}.jpg")
+        image.convert('RGB').save(jpgfile, format='JPEG', quality=RENDER_JPEG_QUALITY)
+        image.close()
+        if on_page:
+            on_page(jpgfile)
+        yield page_number, jpgfile
+
+@timed("RenderPage")
+def render_page(pdf_file, page_number, dpi, outputfolder=None):
+    """
+    Renders a single page of a PDF at the given resolution.
+    :param pdf_file: Path of the PDF.
+    :param page_number: 1-based page number.
+    :param dpi: Rendering resolution.
+    :param outputfolder: Folder for the rendered image.
+    :return: Path of the rendered JPG, or None if rendering failed.
+    """
+    outputfolder = outputfolder or os.path.join("/tmp", f"pdf_pages_{dpi}dpi")
+    os.makedirs(outputfolder, exist_ok=True)
+    try:
+        jpgfiles = get_renderer().render(pdf_file, outputfolder, dpi, pages=[page_number])
+    except Exception as e:
+        logger.error(f"Error rendering page {page_number} of {pdf_file}: {e}", exc_info=True)
+        return None
+    return jpgfiles[0] if jpgfiles else None
@@ -1,13 +1,17 @@
 import logging
 import watchtower
+from config import CLOUDWATCH_LOGS
 import os
 from src.utils import find_word_boundingbox, find_Key_value_inrange
+from src.metrics import timed
 
 # Set up CloudWatch logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-logger.addHandler(watchtower.CloudWatchLogHandler())
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
 
+@timed("ProcessCheckboxes")
 def process_checkboxes(parsed_kv, response):
     """
     Processes checkboxes from the parsed key-value pairs and Textract response data.
@@ -0,0 +1,123 @@
+import os
+import json
+import logging
+import watchtower
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from PyPDF2 import PdfReader, PdfWriter
+from config import CLOUDWATCH_LOGS, AWS_REGION, FANOUT_CHUNK_PAGES, FANOUT_MAX_CONCURRENCY
+from src.metrics import timed, increment
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+def count_pages(pdf_file):
+    return len(PdfReader(pdf_file).pages)
+
+def chunk_name(document_name, first_page, last_page):
+    return f"{document_name}_pages_{first_page:04d}-{last_page:04d}"
+
+@timed("SplitDocument")
+def split_pdf(pdf_file, outputfolder, chunk_pages=FANOUT_CHUNK_PAGES):
+    """
+    Splits a PDF into chunks of consecutive pages.
+    :param pdf_file: Path of the PDF.
+    :param outputfolder: Folder for the chunk PDFs.
+    :param chunk_pages: Number of pages per chunk.
+    :return: List of chunks, each a dictionary with 'path', 'first_page' and 'last_page' (1-based, inclusive).
+    """
+    os.makedirs(outputfolder, exist_ok=True)
+    reader = PdfReader(pdf_file)
+    document_name = os.path.splitext(os.path.basename(pdf_file))[0]
+    chunks = []
+    for start in range(0, len(reader.pages), chunk_pages):
+        end = min(start + chunk_pages, len(reader.pages))
+        writer = PdfWriter()
+        for page in reader.pages[start:end]:
+            writer.add_page(page)
+        path = os.path.join(outputfolder, f"{chunk_name(document_name, start + 1, end)}.pdf")
+        with open(path, 'wb') as file:
+            writer.write(file)
+        chunks.append({"path": path, "first_page": start + 1, "last_page": end})
+    logger.info(f"Split {pdf_file} into {len(chunks)} chunks of up to {chunk_pages} pages")
+    return chunks
+
+def chunk_page_limits(chunks, page_limit, page_range=None):
+    """
+    Splits a document-level page limit across chunks, in page order: a chunk may analyze
+    the pages of the limit left after the pages before it that fall within page_range.
+    :param chunks: Chunks as returned by split_pdf.
+    :param page_limit: Maximum number of pages to analyze in the document, or 0 for no limit.
+    :param page_range: Optional (first, last) page range of the template, 1-based and inclusive.
+    :return: Page limit of each chunk: 0 for no limit, None for a chunk past the limit.
+    """
+    if not page_limit:
+        return [0] * len(chunks)
+    first, last = page_range or (1, chunks[-1]['last_page'] if chunks else 0)
+    limits = []
+    for chunk in chunks:
+        pages_before = max(0, min(chunk['first_page'] - 1, last) - first + 1)
+        remaining = page_limit - pages_before
+        limits.append(remaining if remaining > 0 else None)
+    return limits
+
+class LambdaDispatcher:
+    """
+    Runs chunk tasks on worker invocations of a Lambda function.
+    Each task is sent as {"chunk": task} and invoked synchronously; the worker's
+    response body is the chunk payload.
+    """
+
+    def __init__(self, function_name, client=None, max_concurrency=FANOUT_MAX_CONCURRENCY):
+        self.function_name = function_name
+        self.client = client or boto3.client('lambda', region_name=os.getenv('REGION_NAME', AWS_REGION))
+        self.max_concurrency = max_concurrency
+
+    def invoke(self, task):
+        increment("WorkerInvocations")
+        try:
+            response = self.client.invoke(FunctionName=self.function_name, InvocationType='RequestResponse',
+                                          Payload=json.dumps({"chunk": task}))
+            result = json.loads(response['Payload'].read())
+            if response.get('FunctionError'):
+                return {"error": result.get('errorMessage', response['FunctionError'])}
+            return json.loads(result['body'])
+        except Exception as e:
+            logger.error(f"Error invoking worker for {task['key']}: {e}", exc_info=True)
+            return {"error": str(e)}
+
+    def map(self, tasks):
+        """
+        Runs the tasks concurrently.
+        :return: Chunk payloads in task order; failed tasks yield {"error": message}.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return list(pool.map(self.invoke, tasks))
+
+class LocalDispatcher:
+    """
+    In-process stand-in for LambdaDispatcher, used for tests and offline runs.
+    :param worker: Callable taking a chunk task and returning its payload, e.g. lambda_function.process_chunk.
+    """
+
+    def __init__(self, worker, max_concurrency=1):
+        self.worker = worker
+        self.max_concurrency = max_concurrency
+
+    def invoke(self, task):
+        increment("WorkerInvocations")
+        try:
+            return self.worker(task)
+        except Exception as e:
+            logger.error(f"Error running worker for {task['key']}: {e}", exc_info=True)
+            return {"error": str(e)}
+
+    def map(self, tasks):
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return list(pool.map(self.invoke, tasks))
+
+# Log a message when the module is loaded
+logger.info("Fan-out module loaded successfully")
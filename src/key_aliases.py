@@ -0,0 +1,211 @@
+import json
+import uuid
+import logging
+import watchtower
+from datetime import datetime
+from config import BUCKET, CLOUDWATCH_LOGS, ALIASES_ENABLED, ALIASES_PREFIX, ALIASES_MAX_SEGMENTS
+from src.response_store import template_version
+from src.metrics import increment
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+class AliasTable:
+    """
+    Learned mapping from cleaned raw Textract keys (e.g. 'meter no') to the template keys
+    they resolved to (e.g. 'Meter #'), with the fuzzy match score.
+
+    find_matching_value takes the scores of known aliases from here instead of fuzzy
+    matching them, so a layout that has been seen before is matched with dictionary hits.
+    Keys that scored below the match threshold are remembered as rejected, so fuzzy
+    matching only runs for keys never seen before. A table belongs to one template
+    version. Each save writes what was learned since the last save as a new segment
+    object under the version's prefix, and loading merges every segment, so warm
+    containers and batch workers share the table without overwriting each other.
+    """
+
+    def __init__(self, enabled=ALIASES_ENABLED):
+        self.enabled = enabled
+        self.storage = None
+        self.version = None
+        self.aliases = {}
+        self.rejected = {}
+        # Learned since the last save, in the same shapes as aliases and rejected
+        self.learned = {}
+        self.learned_rejected = {}
+
+    @property
+    def dirty(self):
+        return bool(self.learned or self.learned_rejected)
+
+    def configure(self, storage):
+        """
+        Sets the storage the table is loaded from and saved to; S3 by default.
+        A different storage reloads the table on next use.
+        """
+        if storage is not self.storage:
+            self.storage = storage
+            self.version = None
+
+    def prefix(self, version=None):
+        return f"{ALIASES_PREFIX}{version or self.version}/"
+
+    def use(self, template):
+        """
+        Switches to the table of a template, loading it when the template version changes.
+        :param template: Full template dictionary (hints included).
+        """
+        if not self.enabled:
+            return
+        version = template_version(template)
+        if version == self.version:
+            return
+        self.version = version
+        self.aliases = {}
+        self.rejected = {}
+        self.learned = {}
+        self.learned_rejected = {}
+        segments = self.load()
+        if len(segments) > ALIASES_MAX_SEGMENTS:
+            self.compact(segments)
+        logger.info(f"Using {sum(len(keys) for keys in self.aliases.values())} key aliases "
+                    f"for template version {version}")
+
+    def get_storage(self):
+        if self.storage is None:
+            from src.storage import S3Storage
+            self.storage = S3Storage(BUCKET)
+        return self.storage
+
+    def load(self):
+        """
+        Merges the stored segments of the current version into the table. A segment that
+        cannot be read (e.g. one still being written) is skipped and merged on a later load.
+        :return: Keys of the segments merged.
+        """
+        storage = self.get_storage()
+        try:
+            keys = sorted(storage.list_keys(self.prefix()))
+        except Exception as e:
+            logger.info(f"No stored key aliases under {self.prefix()}: {e}")
+            return []
+        merged = []
+        for key in keys:
+            try:
+                data = json.loads(storage.get_object(key))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable key alias segment {key}: {e}")
+                continue
+            if data.get("template_version") != self.version:
+                continue
+            self.merge(data.get("aliases", {}), data.get("rejected", {}))
+            merged.append(key)
+        return merged
+
+    def merge(self, aliases, rejected=None):
+        """
+        Merges another table: aliases ({template key: {cleaned key: score}}) keep the
+        higher score, rejected keys ({template key: [cleaned keys]}) are combined.
+        :return: Number of aliases added or improved.
+        """
+        changed = 0
+        for template_key, keys in aliases.items():
+            known = self.aliases.setdefault(template_key, {})
+            for cleaned_key, score in keys.items():
+                if score > known.get(cleaned_key, 0.0):
+                    known[cleaned_key] = score
+                    changed += 1
+        for template_key, keys in (rejected or {}).items():
+            self.rejected.setdefault(template_key, set()).update(keys)
+        return changed
+
+    def lookup(self, template_key, cleaned_keys):
+        """
+        Finds the known aliases of a template key among a page's keys.
+        :param template_key: Template key being matched.
+        :param cleaned_keys: Cleaned keys of the page.
+        :return: Dictionary of the known aliases on the page and their match scores; empty on a miss.
+        """
+        if not self.enabled:
+            return {}
+        known = self.aliases.get(template_key) or {}
+        hits = {cleaned_key: known[cleaned_key] for cleaned_key in cleaned_keys if cleaned_key in known}
+        increment("CacheHits" if hits else "CacheMisses")
+        return hits
+
+    def is_rejected(self, template_key, cleaned_key):
+        return self.enabled and cleaned_key in self.rejected.get(template_key, ())
+
+    def record(self, template_key, cleaned_key, score):
+        """Records a fuzzy match that was accepted."""
+        if not self.enabled or self.version is None:
+            return
+        if score > self.aliases.setdefault(template_key, {}).get(cleaned_key, 0.0):
+            self.aliases[template_key][cleaned_key] = score
+            self.learned.setdefault(template_key, {})[cleaned_key] = score
+
+    def reject(self, template_key, cleaned_keys):
+        """Records keys that scored below the match threshold for a template key."""
+        if not self.enabled or self.version is None or not cleaned_keys:
+            return
+        new_keys = set(cleaned_keys) - self.rejected.setdefault(template_key, set())
+        if new_keys:
+            self.rejected[template_key].update(new_keys)
+            self.learned_rejected.setdefault(template_key, set()).update(new_keys)
+
+    def write_segment(self, aliases, rejected):
+        """
+        Writes a table as a new segment object; segment keys sort by creation time and never collide.
+        :return: Key of the written segment.
+        """
+        key = f"{self.prefix()}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}-{uuid.uuid4().hex[:8]}.json"
+        body = json.dumps({"template_version": self.version, "aliases": aliases,
+                           "rejected": {template_key: sorted(keys) for template_key, keys in rejected.items()}},
+                          sort_keys=True)
+        self.get_storage().put_object(key, body)
+        return key
+
+    def save(self):
+        """
+        Writes the aliases and rejected keys learned since the last save as a new segment.
+        :return: True if a segment was written.
+        """
+        if not self.enabled or not self.dirty:
+            return False
+        try:
+            key = self.write_segment(self.learned, self.learned_rejected)
+            self.learned = {}
+            self.learned_rejected = {}
+            logger.info(f"Saved key aliases to {self.get_storage().uri(key)}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving key aliases under {self.prefix()}: {e}", exc_info=True)
+            return False
+
+    def compact(self, segments):
+        """
+        Replaces the given segments with a single one holding the whole table. The merged
+        segment is written before any is deleted, and segments written meanwhile are kept,
+        so concurrent writers and compactions never lose an alias.
+        """
+        try:
+            key = self.write_segment(self.aliases, self.rejected)
+        except Exception as e:
+            logger.error(f"Error compacting key aliases under {self.prefix()}: {e}", exc_info=True)
+            return
+        for segment in segments:
+            try:
+                self.get_storage().delete_object(segment)
+            except Exception as e:
+                # Another container may have compacted the same segment already
+                logger.info(f"Could not delete key alias segment {segment}: {e}")
+        logger.info(f"Compacted {len(segments)} key alias segments into {self.get_storage().uri(key)}")
+
+# Process-wide alias table shared by all matching calls
+aliases = AliasTable()
+
+# Log a message when the module is loaded
+logger.info("Key aliases module loaded successfully")
@@ -0,0 +1,191 @@
+import io
+import json
+import time
+import logging
+import cProfile
+import pstats
+import functools
+import tracemalloc
+import contextlib
+import watchtower
+from config import CLOUDWATCH_LOGS, METRICS_ENABLED, METRICS_NAMESPACE, METRICS_TRACEMALLOC, PROFILE_ENABLED
+
+# resource is Unix-only; without it (e.g. on Windows) PeakRSS is not reported
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+# Shared no-op context manager returned by stage() when metrics are disabled
+_NOOP_STAGE = contextlib.nullcontext()
+
+class Metrics:
+    """
+    Per-invocation stage timers, counters and memory figures, emitted as a
+    CloudWatch Embedded Metric Format (EMF) JSON line.
+    When disabled every call is a flag check, so instrumented code runs at full speed.
+    """
+
+    def __init__(self, namespace=METRICS_NAMESPACE, enabled=METRICS_ENABLED):
+        self.namespace = namespace
+        self.default_enabled = enabled
+        self.enabled = enabled
+        self.profiler = None
+        self.reset()
+
+    def reset(self):
+        self.timings = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+
+    def start_invocation(self, enabled=None, profile=None):
+        """
+        Starts collecting metrics for a new invocation.
+        :param enabled: Overrides METRICS_ENABLED for this invocation only; None uses METRICS_ENABLED.
+        :param profile: Run cProfile for this invocation (defaults to PROFILE_ENABLED).
+        """
+        # A warm container must not keep the override of an earlier event
+        self.enabled = self.default_enabled if enabled is None else enabled
+        self.reset()
+        if not self.enabled:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            return
+        if METRICS_TRACEMALLOC:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+        if profile if profile is not None else PROFILE_ENABLED:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    @contextlib.contextmanager
+    def _timed_stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def stage(self, name):
+        """
+        Context manager timing a pipeline stage; repeated stages (e.g. per page) accumulate.
+        :param name: Stage name, used as the metric name prefix.
+        """
+        if not self.enabled:
+            return _NOOP_STAGE
+        return self._timed_stage(name)
+
+    def timed(self, name):
+        """
+        Decorator timing every call of a function as the given stage.
+        :param name: Stage name, used as the metric name prefix.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._timed_stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, name, value=1):
+        """
+        Adds to a counter such as pages, blocks or cache hits.
+        :param name: Counter name.
+        :param value: Amount to add.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def memory(self):
+        """
+        Collects memory figures for the invocation.
+        :return: Dictionary of memory metrics in megabytes.
+        """
+        figures = {}
+        if resource is not None:
+            # ru_maxrss is reported in kilobytes on Linux
+            figures["PeakRSS"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        if tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            figures["PeakTracedMemory"] = peak / (1024 * 1024)
+        return figures
+
+    def stop_profiler(self, limit=30):
+        """
+        Stops cProfile and logs the most expensive functions by cumulative time.
+        :param limit: Number of functions to log.
+        :return: Profile report text, or None if profiling was not enabled.
+        """
+        if not self.profiler:
+            return None
+        self.profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+        self.profiler = None
+        report = output.getvalue()
+        logger.info(f"Invocation profile:\n{report}")
+        return report
+
+    def build_emf(self, dimensions=None):
+        """
+        Builds the Embedded Metric Format document for the invocation.
+        :param dimensions: Dictionary of dimension names to values (e.g. {"Function": "extraction"}).
+        :return: EMF dictionary.
+        """
+        dimensions = dimensions or {}
+        values = {f"{name}Time": round(ms, 3) for name, ms in self.timings.items()}
+        values["InvocationTime"] = round((time.perf_counter() - self.started) * 1000, 3)
+        units = {name: "Milliseconds" for name in values}
+        for name, value in self.counters.items():
+            values[name] = value
+            units[name] = "Count"
+        for name, value in self.memory().items():
+            values[name] = round(value, 3)
+            units[name] = "Megabytes"
+
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()]
+                }]
+            },
+            **dimensions,
+            **values
+        }
+
+    def emit(self, dimensions=None):
+        """
+        Prints the invocation metrics as a single EMF JSON line; Lambda ships stdout to
+        CloudWatch Logs, which extracts the metrics.
+        :param dimensions: Dictionary of dimension names to values.
+        :return: The emitted EMF dictionary, or None if metrics are disabled.
+        """
+        if not self.enabled:
+            return None
+        self.stop_profiler()
+        document = self.build_emf(dimensions)
+        print(json.dumps(document))
+        return document
+
+# Process-wide recorder shared by all pipeline modules
+metrics = Metrics()
+stage = metrics.stage
+timed = metrics.timed
+increment = metrics.increment
+
+# Log a message when the module is loaded
+logger.info("Metrics module loaded successfully")
@@ -0,0 +1,176 @@
+import logging
+import watchtower
+import os
+from PIL import Image, ImageStat
+from config import (CLOUDWATCH_LOGS, TRIAGE_ENABLED, TRIAGE_DETECT_TABLES, BLANK_PAGE_INK_RATIO, BLANK_PAGE_STDDEV,
+                    TRIAGE_MIN_RULE_LENGTH, TRIAGE_MIN_TABLE_RULES, TEXTRACT_FEATURES, TEXTRACT_PAGE_PRICES)
+from src.metrics import timed
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+# Pages are downscaled to this width before ruling lines are detected
+TRIAGE_WIDTH = 1000
+# Grayscale values below this are treated as ink
+INK_THRESHOLD = 128
+
+def load_triage_image(image_path):
+    """
+    Loads a page image as grayscale for triage.
+    :param image_path: Path of the rendered page image.
+    :return: Tuple of (full resolution grayscale image, copy downscaled to at most TRIAGE_WIDTH).
+    """
+    with Image.open(image_path) as image:
+        image = image.convert('L')
+    small = image
+    if image.width > TRIAGE_WIDTH:
+        height = max(1, int(image.height * TRIAGE_WIDTH / image.width))
+        small = image.resize((TRIAGE_WIDTH, height), Image.BILINEAR)
+    return image, small
+
+def ink_ratio(image):
+    """
+    Computes the fraction of pixels dark enough to be ink.
+    :param image: Grayscale PIL image.
+    :return: Ratio of ink pixels to all pixels.
+    """
+    histogram = image.histogram()
+    total = sum(histogram)
+    return sum(histogram[:INK_THRESHOLD]) / total if total else 0.0
+
+def count_ruling_lines(image, min_length=TRIAGE_MIN_RULE_LENGTH):
+    """
+    Counts horizontal ruling lines, i.e. rows holding an unbroken ink run
+    spanning at least min_length of the page width. Adjacent rows belong to the same line.
+    :param image: Grayscale PIL image (transpose it to count vertical lines).
+    :param min_length: Minimum run length as a fraction of the image width.
+    :return: Number of distinct ruling lines.
+    """
+    width, height = image.size
+    # Ink becomes 0xFF and paper 0x00, so splitting a row on paper leaves the ink runs
+    data = image.point(lambda p: 255 if p < INK_THRESHOLD else 0).tobytes()
+    min_run = int(width * min_length)
+    lines = 0
+    previous_row_is_rule = False
+    for y in range(height):
+        row = data[y * width:(y + 1) * width]
+        is_rule = max(map(len, row.split(b'\x00'))) >= min_run
+        if is_rule and not previous_row_is_rule:
+            lines += 1
+        previous_row_is_rule = is_rule
+    return lines
+
+def feature_label(feature_types):
+    """
+    Builds a stable label for a FeatureTypes combination, e.g. 'FORMS+TABLES'.
+    :param feature_types: List of Textract feature types.
+    :return: Label string ('NONE' for skipped pages).
+    """
+    return '+'.join(sorted(feature_types)) if feature_types else 'NONE'
+
+def triage_page(image_path, page_number, page_hints=None):
+    """
+    Decides whether a page should be sent to Textract and with which features.
+    :param image_path: Path of the rendered page image.
+    :param page_number: 1-based page number.
+    :param page_hints: Optional template hints mapping page numbers to feature lists.
+    :return: Dictionary describing the triage decision for the page.
+    """
+    decision = {
+        "page": page_number,
+        "image": os.path.basename(image_path),
+        "blank": False,
+        "feature_types": list(TEXTRACT_FEATURES),
+        "reason": "triage disabled"
+    }
+    if not TRIAGE_ENABLED:
+        return decision
+
+    # Ink statistics use full resolution so thin strokes of sparse pages are not averaged away
+    image, small = load_triage_image(image_path)
+    ratio = ink_ratio(image)
+    stddev = ImageStat.Stat(image).stddev[0]
+    decision["ink_ratio"] = round(ratio, 5)
+
+    if ratio < BLANK_PAGE_INK_RATIO or stddev < BLANK_PAGE_STDDEV:
+        decision.update(blank=True, feature_types=[], reason="blank page")
+        logger.info(f"Page {page_number} is blank (ink ratio {ratio:.5f}, stddev {stddev:.2f}); skipping")
+        return decision
+
+    hinted = (page_hints or {}).get(str(page_number))
+    if hinted is not None and not hinted:
+        # analyze_document would fall back to the default features for an empty list, so an empty hint skips the page
+        decision.update(blank=True, feature_types=[], reason="template page hint: skip")
+        logger.info(f"Page {page_number} is skipped by a template page hint")
+        return decision
+    if hinted is not None:
+        decision.update(feature_types=list(hinted), reason="template page hint")
+    elif TRIAGE_DETECT_TABLES:
+        horizontal = count_ruling_lines(small)
+        vertical = count_ruling_lines(small.transpose(Image.TRANSPOSE))
+        decision["ruling_lines"] = {"horizontal": horizontal, "vertical": vertical}
+        # Key-value pairs drive most of the template, so FORMS is always kept for non-blank pages
+        features = ["FORMS"]
+        if horizontal + vertical >= TRIAGE_MIN_TABLE_RULES:
+            features.append("TABLES")
+        decision.update(feature_types=features, reason="ruling line detection")
+    else:
+        decision["reason"] = "table detection disabled"
+
+    logger.info(f"Page {page_number} triaged with features {decision['feature_types']} ({decision['reason']})")
+    return decision
+
+@timed("Triage")
+def triage_rendered_page(jpg_file, page_number, page_hints=None):
+    """
+    Triages one page as it is rendered, falling back to the full feature set if triage fails.
+    :return: Triage decision for the page.
+    """
+    try:
+        return triage_page(jpg_file, page_number, page_hints)
+    except Exception as e:
+        # Never drop a page because triage failed
+        logger.error(f"Error triaging page {page_number} ({jpg_file}): {e}", exc_info=True)
+        return {
+            "page": page_number,
+            "image": os.path.basename(jpg_file),
+            "blank": False,
+            "feature_types": list(TEXTRACT_FEATURES),
+            "reason": "triage failed"
+        }
+
+def build_triage_report(document, decisions):
+    """
+    Summarises triage decisions and the Textract cost they saved.
+    :param document: Name of the processed document.
+    :param decisions: List of per-page triage decisions.
+    :return: Report dictionary.
+    """
+    baseline_label = feature_label(TEXTRACT_FEATURES)
+    baseline_cost = TEXTRACT_PAGE_PRICES.get(baseline_label, 0.0) * len(decisions)
+    estimated_cost = sum(TEXTRACT_PAGE_PRICES.get(feature_label(d["feature_types"]), 0.0) for d in decisions)
+
+    feature_counts = {}
+    for decision in decisions:
+        label = feature_label(decision["feature_types"])
+        feature_counts[label] = feature_counts.get(label, 0) + 1
+
+    report = {
+        "document": document,
+        "pages": len(decisions),
+        "skipped_pages": [d["page"] for d in decisions if d["blank"]],
+        "feature_counts": feature_counts,
+        "baseline_cost": round(baseline_cost, 4),
+        "estimated_cost": round(estimated_cost, 4),
+        "estimated_savings": round(baseline_cost - estimated_cost, 4),
+        "decisions": decisions
+    }
+    logger.info(f"Triage for {document}: skipped {len(report['skipped_pages'])}/{len(decisions)} pages, "
+                f"features {feature_counts}, estimated savings ${report['estimated_savings']}")
+    return report
+
+# Log a message when the module is loaded
+logger.info("Page triage module loaded successfully")
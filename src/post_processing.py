@@ -2,13 +2,17 @@ import json
 from datetime import datetime
 import logging
 import watchtower
+from config import CLOUDWATCH_LOGS
+from src.metrics import timed
 import os
 
 # Set up CloudWatch logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-logger.addHandler(watchtower.CloudWatchLogHandler())
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
 
+@timed("PostProcess")
 def post_process(matched_data):
     """
     Main function to post-process matched data.
@@ -0,0 +1,179 @@
+import io
+import os
+import logging
+import watchtower
+from difflib import SequenceMatcher
+from PIL import Image
+from config import (CLOUDWATCH_LOGS, REFINE_CONFIDENCE_THRESHOLD, REFINE_DPI, REFINE_MAX_REGIONS,
+                    REFINE_PADDING)
+from src.utils import get_text, find_value_block
+from src.response_parser import get_rows_columns_map
+from src.template_matching import clean_key, template_field_paths
+from src.table_index import TableIndex
+from src.textract_api import detect_document_text
+from src.document_preparation import render_page
+from src.metrics import timed, increment
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+# Same threshold find_matching_value uses to accept a key
+KEY_MATCH_THRESHOLD = 0.7
+
+def template_keys(template):
+    """
+    Lists the cleaned names of the template's key/value fields.
+    :param template: Template sections (without hints).
+    :return: List of cleaned field names.
+    """
+    table_paths = set(TableIndex(template).specs)
+    return [clean_key(path.split('/')[-1]) for path in template_field_paths(template) if path not in table_paths]
+
+def is_template_key(key, keys):
+    cleaned = clean_key(key)
+    return any(SequenceMatcher(None, template_key, cleaned).ratio() > KEY_MATCH_THRESHOLD for template_key in keys)
+
+def find_low_confidence_regions(response, parsed_tables, template, threshold=REFINE_CONFIDENCE_THRESHOLD):
+    """
+    Finds low-confidence value and cell blocks that feed template fields.
+    :param response: Textract AnalyzeDocument response of the page.
+    :param parsed_tables: Tables parsed from the response, in TABLE block order.
+    :param template: Template sections (without hints).
+    :param threshold: Confidence below which a block is refined.
+    :return: List of regions, lowest confidence first. Each region holds the block's
+             BoundingBox, Confidence and its target: ('kv', key) or ('cell', table, row, column).
+    """
+    blocks = response.get('Blocks', [])
+    block_map = {block['Id']: block for block in blocks}
+    keys = template_keys(template)
+    table_index = TableIndex(template)
+    regions = []
+
+    value_map = {b['Id']: b for b in blocks if b['BlockType'] == 'KEY_VALUE_SET' and 'KEY' not in b['EntityTypes']}
+    for block in blocks:
+        if block['BlockType'] != 'KEY_VALUE_SET' or 'KEY' not in block['EntityTypes']:
+            continue
+        value_block = find_value_block(block, value_map)
+        if not value_block or value_block.get('Confidence', 100) >= threshold:
+            continue
+        key = get_text(block, block_map)
+        if is_template_key(key, keys):
+            regions.append({"box": value_block['Geometry']['BoundingBox'],
+                            "confidence": value_block['Confidence'], "target": ('kv', key)})
+
+    table_blocks = [b for b in blocks if b['BlockType'] == 'TABLE']
+    for table_number, table_block in enumerate(table_blocks):
+        if table_number >= len(parsed_tables) or not parsed_tables[table_number]:
+            continue
+        path, _ = table_index.classify(parsed_tables[table_number])
+        if not path:
+            continue
+        rows = get_rows_columns_map(table_block, block_map)
+        row_order = list(rows)
+        for relationship in table_block.get('Relationships', []):
+            if relationship['Type'] != 'CHILD':
+                continue
+            for child_id in relationship['Ids']:
+                cell = block_map.get(child_id)
+                if not cell or cell['BlockType'] != 'CELL' or cell.get('Confidence', 100) >= threshold:
+                    continue
+                row = row_order.index(cell['RowIndex'])
+                column = sorted(rows[cell['RowIndex']]).index(cell['ColumnIndex'])
+                regions.append({"box": cell['Geometry']['BoundingBox'], "confidence": cell['Confidence'],
+                                "target": ('cell', table_number, row, column)})
+
+    regions.sort(key=lambda region: region["confidence"])
+    return regions
+
+def crop_region(image, box, padding=REFINE_PADDING):
+    """
+    Crops a normalized Textract BoundingBox (plus padding) out of a page image.
+    :return: JPEG bytes of the crop.
+    """
+    width, height = image.size
+    left = max(0, int((box['Left'] - padding) * width))
+    top = max(0, int((box['Top'] - padding) * height))
+    right = min(width, int((box['Left'] + box['Width'] + padding) * width))
+    bottom = min(height, int((box['Top'] + box['Height'] + padding) * height))
+    output = io.BytesIO()
+    image.crop((left, top, right, bottom)).convert('RGB').save(output, format='JPEG', quality=95)
+    return output.getvalue()
+
+def read_lines(response):
+    """
+    Joins the LINE blocks of a DetectDocumentText response.
+    :return: Tuple of (text, mean line confidence).
+    """
+    lines = [b for b in response.get('Blocks', []) if b['BlockType'] == 'LINE']
+    if not lines:
+        return '', 0.0
+    text = ' '.join(line['Text'] for line in lines)
+    return text, sum(line.get('Confidence', 0.0) for line in lines) / len(lines)
+
+@timed("Refinement")
+def refine_low_confidence(response, parsed_kv, parsed_tables, template, page_image, pdf_path=None,
+                          page_number=None, textract_client=None):
+    """
+    Re-reads low-confidence template fields from high-resolution crops of the page and
+    merges the refined text back into the parsed key/values and tables.
+    :param response: Textract AnalyzeDocument response of the page.
+    :param parsed_kv: Parsed key/value pairs (updated in place).
+    :param parsed_tables: Parsed tables (updated in place).
+    :param template: Template sections (without hints).
+    :param page_image: Path of the page image sent to Textract, used when the PDF cannot be re-rendered.
+    :param pdf_path: Source PDF, re-rendered at REFINE_DPI for the crops.
+    :param page_number: 1-based page number in the PDF.
+    :param textract_client: Textract client to use instead of the module client.
+    :return: Tuple of (parsed_kv, parsed_tables, number of refined fields).
+    """
+    regions = find_low_confidence_regions(response, parsed_tables, template)[:REFINE_MAX_REGIONS]
+    if not regions:
+        return parsed_kv, parsed_tables, 0
+    logger.info(f"Refining {len(regions)} low-confidence regions on page {page_number}")
+
+    # Render next to the page image, i.e. into the document's workspace when it has one
+    hires_folder = os.path.join(os.path.dirname(page_image), "hires") if page_image else None
+    hires_image = render_page(pdf_path, page_number, REFINE_DPI, hires_folder) if pdf_path and page_number else None
+    try:
+        return refine_regions(regions, hires_image or page_image, parsed_kv, parsed_tables, textract_client)
+    finally:
+        # A high-resolution page is several times the size of the page image; drop it as soon as the crops are read
+        if hires_image and os.path.exists(hires_image):
+            os.remove(hires_image)
+
+def refine_regions(regions, image_path, parsed_kv, parsed_tables, textract_client=None):
+    """
+    Re-reads low-confidence regions from crops of an image.
+    :return: Tuple of (parsed_kv, parsed_tables, number of refined fields).
+    """
+    refined = 0
+    with Image.open(image_path) as image:
+        for region in regions:
+            crop_response = detect_document_text(crop_region(image, region["box"]), textract_client)
+            increment("RefinementCalls")
+            if not crop_response:
+                continue
+            text, confidence = read_lines(crop_response)
+            if not text or confidence <= region["confidence"]:
+                continue
+
+            target = region["target"]
+            if target[0] == 'kv':
+                logger.info(f"Refined '{target[1]}': '{parsed_kv.get(target[1])}' -> '{text}' "
+                            f"(confidence {region['confidence']:.1f} -> {confidence:.1f})")
+                parsed_kv[target[1]] = text
+            else:
+                _, table_number, row, column = target
+                logger.info(f"Refined table {table_number} cell ({row}, {column}): "
+                            f"'{parsed_tables[table_number][row][column]}' -> '{text}'")
+                parsed_tables[table_number][row][column] = text
+            refined += 1
+
+    increment("RefinedFields", refined)
+    return parsed_kv, parsed_tables, refined
+
+# Log a message when the module is loaded
+logger.info("Refinement module loaded successfully")
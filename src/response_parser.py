@@ -1,11 +1,14 @@
 import logging
 import watchtower
+from config import CLOUDWATCH_LOGS
 from src.utils import get_text, find_value_block
+from src.metrics import timed, increment
 
 # Set up CloudWatch logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-logger.addHandler(watchtower.CloudWatchLogHandler())
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
 
 def form_kv_from_JSON(response):
     """
@@ -101,6 +104,7 @@ def get_rows_columns_map(table_result, blocks_map):
     logger.info(f"Completed mapping of rows and columns for table block: {table_result['Id']}")
     return rows
 
+@timed("ParseResponse")
 def parse_response(response):
     """
     Parses the Textract JSON response to extract key-value pairs and tables.
@@ -111,6 +115,8 @@ def parse_response(response):
     kv_pairs = form_kv_from_JSON(response)
     tables = get_tables_fromJSON(response)
     logger.info(f"Parsing completed. Extracted {len(kv_pairs)} key-value pairs and {len(tables)} tables.")
+    increment("KeyValuePairs", len(kv_pairs))
+    increment("Tables", len(tables))
     return kv_pairs, tables
 
 # Log a message when the module is loaded
@@ -0,0 +1,135 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import watchtower
+from datetime import datetime
+from config import CLOUDWATCH_LOGS, RAW_RESPONSES_PREFIX
+from src.storage import document_id
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+# Modules whose code turns a raw Textract response into a result; changing any of them
+# changes the pipeline version and invalidates replay caches
+PIPELINE_MODULES = ['utils', 'response_parser', 'document_specific_processing', 'template_matching',
+                    'table_index', 'zone_extraction', 'post_processing']
+
+def fingerprint(data):
+    """
+    Computes a stable SHA-256 digest of JSON-serializable data.
+    """
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def template_version(template):
+    """
+    Versions a template by its content, so any edit yields a new version.
+    :param template: Full template dictionary (hints included).
+    :return: Short version string.
+    """
+    return fingerprint(template)[:16]
+
+def pipeline_version():
+    """
+    Versions the parsing, matching and post-processing code by the content of its modules.
+    :return: Short version string.
+    """
+    digest = hashlib.sha256()
+    for module in PIPELINE_MODULES:
+        with open(os.path.join(os.path.dirname(__file__), f"{module}.py"), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+def bundle_key(source_key, first_page=None):
+    """
+    Names the bundle of a document, or of the fan-out chunk starting at first_page, e.g.
+    'raw_responses/statement-1a2b3c4d.json.gz' or 'raw_responses/statement-1a2b3c4d.part-0051.json.gz'.
+    Keyed by the full source location, so documents sharing a file name never overwrite each other's responses.
+    """
+    part = f".part-{first_page:04d}" if first_page else ""
+    return f"{RAW_RESPONSES_PREFIX}{document_id(source_key)}{part}.json.gz"
+
+def document_bundle_key(key):
+    """
+    Maps the key of a chunk bundle to the key of its document's bundle (other keys are returned unchanged),
+    so the chunk bundles of a fanned-out document can be replayed together.
+    """
+    return re.sub(r'\.part-\d+(?=\.json\.gz$)', '', key)
+
+def strip_metadata(response):
+    # HTTP response metadata differs on every call and is not needed to re-derive results
+    if response is None:
+        return None
+    return {key: value for key, value in response.items() if key != 'ResponseMetadata'}
+
+class ResponseBundle:
+    """
+    Raw AnalyzeDocument responses of one document, persisted as a single gzip-compressed
+    JSON object so results can later be re-derived without calling Textract. Pages read
+    through template zones also keep their DetectDocumentText response.
+    """
+
+    def __init__(self, source_key, template, first_page=None):
+        """
+        :param source_key: Key of the source document.
+        :param template: Full template dictionary (hints included).
+        :param first_page: First page of the fan-out chunk the bundle covers, or None for a whole document.
+        """
+        self.source_key = source_key
+        self.first_page = first_page
+        self.template_version = template_version(template)
+        self.pages = []
+
+    def add_page(self, page_number, image, feature_types, response, text_response=None):
+        """
+        Records the responses of one page.
+        :param response: AnalyzeDocument response, or None for a page read from its zones only.
+        :param text_response: DetectDocumentText response the page's zones were read from, if any.
+        """
+        page = {
+            "page": page_number,
+            "image": image,
+            "feature_types": feature_types,
+            "response": strip_metadata(response)
+        }
+        if text_response is not None:
+            page["text_response"] = strip_metadata(text_response)
+        self.pages.append(page)
+
+    def to_dict(self):
+        return {
+            "document": self.source_key,
+            "template_version": self.template_version,
+            "created": datetime.now().isoformat(),
+            "pages": self.pages
+        }
+
+    def save(self, storage):
+        """
+        Writes the bundle to storage.
+        :return: Key of the written bundle, or None if writing failed.
+        """
+        key = bundle_key(self.source_key, self.first_page)
+        try:
+            body = gzip.compress(json.dumps(self.to_dict(), separators=(',', ':')).encode('utf-8'))
+            storage.put_object(key, body)
+            logger.info(f"Saved {len(self.pages)} raw responses ({len(body)} bytes) to {storage.uri(key)}")
+            return key
+        except Exception as e:
+            logger.error(f"Error saving raw responses to {key}: {e}", exc_info=True)
+            return None
+
+def load_bundle(storage, key):
+    """
+    Reads a bundle written by ResponseBundle.save.
+    :return: Bundle dictionary with 'document', 'template_version' and 'pages'.
+    """
+    return json.loads(gzip.decompress(storage.get_object(key)).decode('utf-8'))
+
+# Log a message when the module is loaded
+logger.info("Response store module loaded successfully")
@@ -0,0 +1,194 @@
+import json
+import uuid
+import hashlib
+import sqlite3
+import logging
+import watchtower
+from datetime import datetime
+from config import CLOUDWATCH_LOGS, INDEX_PREFIX
+from src.template_matching import resolve_path
+from src.metrics import timed, increment
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+SEGMENTS_PREFIX = f"{INDEX_PREFIX}segments/"
+
+# Indexed columns and the result field each one is read from
+INDEXED_FIELDS = {
+    "meter_no": "Statement/Meter #",
+    "operator": "Statement/Operator",
+    "production_date": "Statement/Production Date",
+    "total_payment": "Total Producer Payment"
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    result_uri TEXT PRIMARY KEY,
+    source_uri TEXT,
+    source_etag TEXT,
+    meter_no TEXT,
+    operator TEXT COLLATE NOCASE,
+    production_date TEXT,
+    total_payment REAL,
+    indexed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS results_meter_no ON results (meter_no);
+CREATE INDEX IF NOT EXISTS results_operator ON results (operator);
+CREATE INDEX IF NOT EXISTS results_production_date ON results (production_date);
+CREATE INDEX IF NOT EXISTS results_source_uri ON results (source_uri);
+CREATE TABLE IF NOT EXISTS merged_segments (key TEXT PRIMARY KEY);
+"""
+
+COLUMNS = ["result_uri", "source_uri", "source_etag"] + list(INDEXED_FIELDS) + ["indexed_at"]
+
+# Re-indexing a result replaces its row only with a newer entry, so merges in any order converge
+UPDATE_NEWER = f"""
+ON CONFLICT (result_uri) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in COLUMNS[1:])}
+WHERE excluded.indexed_at >= results.indexed_at
+"""
+UPSERT = f"INSERT INTO results ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)}) {UPDATE_NEWER}"
+# 'WHERE true' keeps SQLite from reading ON CONFLICT as a join constraint
+MERGE = f"INSERT INTO results ({', '.join(COLUMNS)}) SELECT {', '.join(COLUMNS)} FROM other.results WHERE true {UPDATE_NEWER}"
+
+def file_etag(path):
+    """
+    Computes the MD5 hex digest of a file, which is its S3 ETag for single-part uploads.
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def index_entry(result, result_uri, source_uri, source_etag=None):
+    """
+    Builds the index entry of a post-processed document result.
+    :param result: Combined post-processed result.
+    :param result_uri: Location of the saved result (s3:// URI or local path).
+    :param source_uri: Location of the source PDF.
+    :param source_etag: ETag of the source PDF, if known.
+    :return: Entry dictionary with one value per index column.
+    """
+    entry = {"result_uri": result_uri, "source_uri": source_uri, "source_etag": source_etag}
+    for column, path in INDEXED_FIELDS.items():
+        value = resolve_path(result, path)
+        if column == "total_payment":
+            entry[column] = value if isinstance(value, (int, float)) else None
+        else:
+            entry[column] = str(value).strip() if value not in (None, '') else None
+    entry["indexed_at"] = datetime.now().isoformat()
+    return entry
+
+@timed("IndexResult")
+def write_segment(storage, entries):
+    """
+    Writes index entries as a new segment object, to be merged into an index later.
+    Segment keys sort by creation time, so a sync only has to read keys it has not merged.
+    :return: Key of the written segment, or None if writing failed.
+    """
+    key = f"{SEGMENTS_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}.json"
+    try:
+        storage.put_object(key, '\n'.join(json.dumps(entry) for entry in entries) + '\n')
+        increment("IndexedResults", len(entries))
+        logger.info(f"Wrote index segment {storage.uri(key)} with {len(entries)} entries")
+        return key
+    except Exception as e:
+        logger.error(f"Error writing index segment {key}: {e}", exc_info=True)
+        return None
+
+class ResultIndex:
+    """
+    SQLite index of extraction results by meter, operator and production date.
+    Updated incrementally from segments or entries, and mergeable with other index files.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, entries):
+        """Adds or refreshes index entries."""
+        with self.connection:
+            self.upsert(entries)
+
+    def upsert(self, entries):
+        self.connection.executemany(UPSERT, [[entry.get(column) for column in COLUMNS] for entry in entries])
+
+    def sync(self, storage, prefix=SEGMENTS_PREFIX):
+        """
+        Merges the segments under prefix that have not been merged yet.
+        :return: Number of segments merged.
+        """
+        merged = {row['key'] for row in self.connection.execute("SELECT key FROM merged_segments")}
+        pending = sorted(key for key in storage.list_keys(prefix) if key not in merged)
+        for key in pending:
+            lines = storage.get_object(key).decode('utf-8').splitlines()
+            entries = [json.loads(line) for line in lines if line.strip()]
+            with self.connection:
+                self.upsert(entries)
+                self.connection.execute("INSERT INTO merged_segments (key) VALUES (?)", (key,))
+        logger.info(f"Merged {len(pending)} new index segments into {self.path}")
+        return len(pending)
+
+    def merge(self, other_path):
+        """
+        Merges another index file, e.g. one written by a separate batch run.
+        :return: Number of rows read from the other index.
+        """
+        self.connection.execute("ATTACH DATABASE ? AS other", (other_path,))
+        try:
+            with self.connection:
+                count = self.connection.execute("SELECT COUNT(*) FROM other.results").fetchone()[0]
+                self.connection.execute(MERGE)
+                self.connection.execute("INSERT OR IGNORE INTO merged_segments SELECT key FROM other.merged_segments")
+        finally:
+            self.connection.execute("DETACH DATABASE other")
+        logger.info(f"Merged {count} rows from {other_path} into {self.path}")
+        return count
+
+    def query(self, meter_no=None, operator=None, production_date=None, date_from=None, date_to=None,
+              source_uri=None, limit=None):
+        """
+        Finds indexed results. All given criteria must match; operator matching ignores case.
+        :param production_date: Exact production date (as stored, e.g. '2024-01-31').
+        :param date_from: Earliest production date, inclusive.
+        :param date_to: Latest production date, inclusive.
+        :return: List of matching entries, newest production date first.
+        """
+        conditions, parameters = [], []
+        for column, operator_sql, value in [("meter_no", "=", meter_no), ("operator", "=", operator),
+                                            ("production_date", "=", production_date),
+                                            ("production_date", ">=", date_from), ("production_date", "<=", date_to),
+                                            ("source_uri", "=", source_uri)]:
+            if value is not None:
+                conditions.append(f"{column} {operator_sql} ?")
+                parameters.append(value)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY production_date DESC, result_uri"
+        if limit:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return [dict(row) for row in self.connection.execute(sql, parameters)]
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+# Log a message when the module is loaded
+logger.info("Result index module loaded successfully")
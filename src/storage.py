@@ -0,0 +1,129 @@
+import logging
+import watchtower
+import os
+import shutil
+import hashlib
+import threading
+import boto3
+from config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, CLOUDWATCH_LOGS
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+class S3Storage:
+    """
+    Object storage backed by an S3 bucket. Errors are raised as botocore ClientError.
+    """
+
+    def __init__(self, bucket, client=None):
+        self.bucket = bucket
+        self.client = client or boto3.client('s3',
+                                             aws_access_key_id=AWS_ACCESS_KEY_ID,
+                                             aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                                             region_name=AWS_REGION)
+
+    def uri(self, key):
+        return f"s3://{self.bucket}/{key}"
+
+    def upload_file(self, file_path, key):
+        self.client.upload_file(file_path, self.bucket, key)
+
+    def download_file(self, key, file_path):
+        self.client.download_file(self.bucket, key, file_path)
+
+    def put_object(self, key, body):
+        self.client.put_object(Body=body, Bucket=self.bucket, Key=key)
+
+    def get_object(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def delete_object(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list_keys(self, prefix=''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get('Contents', []):
+                yield item['Key']
+
+# Suffix of the temporary files LocalStorage.put_object writes before renaming them into place
+TEMP_SUFFIX = '.tmp'
+
+class LocalStorage:
+    """
+    Object storage backed by a local directory, used for offline batch runs.
+    Keys map to paths below the root directory. Errors are raised as OSError.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.bucket = self.root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def uri(self, key):
+        return self.path(key)
+
+    def upload_file(self, file_path, key):
+        destination = self.path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(file_path, destination)
+
+    def download_file(self, key, file_path):
+        shutil.copyfile(self.path(key), file_path)
+
+    def put_object(self, key, body):
+        destination = self.path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        mode = 'wb' if isinstance(body, bytes) else 'w'
+        # Write then rename, so concurrent readers see the old or the new object but never a partial one, as on S3
+        temp_path = os.path.join(os.path.dirname(destination),
+                                 f".{os.path.basename(destination)}.{os.getpid()}.{threading.get_ident()}{TEMP_SUFFIX}")
+        with open(temp_path, mode) as file:
+            file.write(body)
+        os.replace(temp_path, destination)
+
+    def get_object(self, key):
+        with open(self.path(key), 'rb') as file:
+            return file.read()
+
+    def delete_object(self, key):
+        os.remove(self.path(key))
+
+    def list_keys(self, prefix=''):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith('.') and name.endswith(TEMP_SUFFIX):
+                    # An object still being written by put_object
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    yield key
+
+def parse_s3_uri(uri):
+    """
+    Splits an s3://bucket/key URI into its bucket and key.
+    :param uri: S3 URI.
+    :return: Tuple of (bucket, key).
+    """
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+def document_id(source):
+    """
+    Names a document after its file name plus a short hash of its full location, e.g.
+    'statement-1a2b3c4d', so documents sharing a file name in different folders never
+    share page uploads, intermediate results or result objects.
+    :param source: S3 key, s3:// URI or local path of the source PDF.
+    :return: Document id.
+    """
+    name = os.path.splitext(os.path.basename(source))[0]
+    return f"{name}-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}"
+
+# Log a message when the module is loaded
+logger.info("Storage module loaded successfully")
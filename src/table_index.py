@@ -0,0 +1,181 @@
+import re
+import logging
+import watchtower
+from difflib import SequenceMatcher
+from config import CLOUDWATCH_LOGS
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+# Minimum share of template column names a header row must match to identify a table
+HEADER_MATCH_THRESHOLD = 0.6
+# Minimum similarity for a title cell or a single header cell to count as a match
+CELL_MATCH_THRESHOLD = 0.8
+
+def normalize_cell(text):
+    return re.sub(r'[^a-z0-9]+', ' ', (text or '').lower()).strip()
+
+def header_signature(row):
+    """
+    Builds the normalized signature of a header row, e.g. ('description', 'mcf', 'mmbtu').
+    """
+    return tuple(normalize_cell(cell) for cell in row)
+
+def looks_like_header(row):
+    """
+    Tells whether a row reads like a header: every cell holds text and none holds a number,
+    e.g. ['Check #', 'Date', 'Amount'] but not ['Methane', '85.2', '1.1'].
+    """
+    cells = [normalize_cell(cell) for cell in row]
+    return all(cells) and not any(re.search(r'\d', cell) for cell in cells)
+
+def table_specs(template):
+    """
+    Lists the table specs of a template with their field paths.
+    :param template: Template sections (without hints).
+    :return: List of (path, spec) tuples, e.g. ('Physical Information/Volumes', {...}).
+    """
+    specs = []
+    for section, section_template in template.items():
+        if not isinstance(section_template, dict):
+            continue
+        if 'TableName' in section_template:
+            specs.append((section, section_template))
+            continue
+        for key, value_type in section_template.items():
+            if isinstance(value_type, dict) and 'TableName' in value_type:
+                specs.append((f"{section}/{key}", value_type))
+    return specs
+
+class TableIndex:
+    """
+    Document-wide index of parsed tables keyed by template table path.
+
+    Tables are identified once, when their page is added, from a normalized header-row
+    signature matched against the template's ColumnNames (falling back to a title cell
+    matching TableName). A table continuing on the next page, either with a repeated
+    header or as a headerless fragment with the same column count at the top of the page,
+    is stitched onto the table it continues. A fragment whose first row reads like the
+    header of some other table is not a continuation and closes the open table. Lookups
+    per spec are then dictionary hits.
+    """
+
+    def __init__(self, template):
+        self.specs = dict(table_specs(template))
+        self.by_signature = {}
+        self.by_title = {}
+        for path, spec in self.specs.items():
+            if spec.get('ColumnNames'):
+                self.by_signature[header_signature(spec['ColumnNames'])] = path
+            self.by_title[normalize_cell(spec['TableName'])] = path
+        self.tables = {}
+        self.pages = {}
+        # Parsed tables as added, so a fan-out reducer can rebuild the index across chunks
+        self.page_tables = {}
+        # Table left open at the bottom of the last added page: (page_number, path, column_count)
+        self.open_table = None
+
+    def header_match_score(self, row, column_names):
+        """Share of template column names found in a header row."""
+        cells = [normalize_cell(cell) for cell in row]
+        matched = 0
+        for column in column_names:
+            column = normalize_cell(column)
+            if column in cells or any(SequenceMatcher(None, column, cell).ratio() > CELL_MATCH_THRESHOLD for cell in cells):
+                matched += 1
+        return matched / len(column_names) if column_names else 0.0
+
+    def is_header(self, row, path):
+        column_names = self.specs[path].get('ColumnNames', [])
+        return bool(column_names) and self.header_match_score(row, column_names) >= HEADER_MATCH_THRESHOLD
+
+    def classify(self, table):
+        """
+        Identifies which template table a parsed table is.
+        :param table: Parsed table (list of rows).
+        :return: Tuple of (template path or None, number of leading header/title rows).
+        """
+        first_row = table[0]
+        path = self.by_signature.get(header_signature(first_row))
+        if path:
+            return path, 1
+
+        # Title row, e.g. a merged 'Volumes' cell above the header
+        first_cell = normalize_cell(first_row[0]) if first_row else ''
+        path = self.by_title.get(first_cell)
+        if not path and first_cell:
+            for title, candidate in self.by_title.items():
+                if SequenceMatcher(None, title, first_cell).ratio() > CELL_MATCH_THRESHOLD:
+                    path = candidate
+                    break
+        if path:
+            header_rows = 2 if len(table) > 1 and self.is_header(table[1], path) else 1
+            return path, header_rows
+
+        best_path, best_score = None, 0.0
+        for candidate, spec in self.specs.items():
+            score = self.header_match_score(first_row, spec.get('ColumnNames', []))
+            if score > best_score:
+                best_path, best_score = candidate, score
+        if best_score >= HEADER_MATCH_THRESHOLD:
+            return best_path, 1
+        return None, 0
+
+    def add_page(self, page_number, tables):
+        """
+        Indexes the parsed tables of a page, stitching continuations onto the previous page's table.
+        :param page_number: 1-based page number; pages must be added in order.
+        :param tables: Parsed tables of the page, in reading order.
+        """
+        previous = self.open_table if self.open_table and self.open_table[0] == page_number - 1 else None
+        self.open_table = None
+        self.pages[page_number] = []
+        self.page_tables[page_number] = tables
+
+        for position, table in enumerate(tables):
+            if not table or not isinstance(table, list) or not isinstance(table[0], list) or not table[0]:
+                logger.warning(f"Unexpected table structure on page {page_number}: {table}")
+                continue
+            path, header_rows = self.classify(table)
+            column_count = max(len(row) for row in table)
+
+            # An unidentified table only continues the open one if it is headerless
+            continues = previous and position == 0 and (
+                path == previous[1] or
+                (path is None and column_count == previous[2] and not looks_like_header(table[0])))
+            if continues:
+                path = previous[1]
+                self.tables[path].extend(table[header_rows:])
+                logger.info(f"Stitched {len(table) - header_rows} rows from page {page_number} onto table '{path}'")
+            elif path and path not in self.tables:
+                self.tables[path] = [list(row) for row in table]
+                logger.info(f"Indexed table '{path}' from page {page_number} with {len(table)} rows")
+            elif path:
+                logger.info(f"Ignoring another '{path}' table on page {page_number}; the first one is kept")
+                path = None
+
+            self.pages[page_number].append(path)
+            self.open_table = (page_number, path, column_count) if path else None
+
+    def get(self, path):
+        return self.tables.get(path)
+
+    def matched_data(self):
+        """
+        Returns the indexed tables in the shape of match_template output,
+        e.g. {'Physical Information': {'Volumes': [...]}, 'Analysis': [...]}.
+        """
+        matched_data = {}
+        for path, table in self.tables.items():
+            section, _, key = path.partition('/')
+            if key:
+                matched_data.setdefault(section, {})[key] = table
+            else:
+                matched_data[section] = table
+        return matched_data
+
+# Log a message when the module is loaded
+logger.info("Table index module loaded successfully")
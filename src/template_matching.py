@@ -1,20 +1,28 @@
 import json
 import logging
 import re
+from functools import lru_cache
 from difflib import SequenceMatcher
 import boto3
 import os
 import watchtower
+from config import CLOUDWATCH_LOGS, AWS_REGION
+from src.metrics import timed, increment
+from src.table_index import TableIndex
+from src.key_aliases import aliases
 
 # Set up CloudWatch logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-logger.addHandler(watchtower.CloudWatchLogHandler())
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
 
 # Initialize S3 client
-s3_client = boto3.client('s3', region_name=os.getenv('REGION_NAME'))
+s3_client = boto3.client('s3', region_name=os.getenv('REGION_NAME', AWS_REGION))
 S3_BUCKET = os.getenv('S3_BUCKET')
 TEMPLATE_S3_KEY = os.getenv('TEMPLATE_S3_KEY', 'templates/template.json')
+# Top-level template key holding processing hints rather than fields to match
+TEMPLATE_HINTS_KEY = '_Hints'
 
 def load_template():
     """
@@ -23,6 +31,7 @@ def load_template():
     """
     try:
         logger.info(f"Attempting to load template from S3: {S3_BUCKET}/{TEMPLATE_S3_KEY}")
+        increment("TemplateLoads")
         # Try to load from S3 first
         response = s3_client.get_object(Bucket=S3_BUCKET, Key=TEMPLATE_S3_KEY)
         template_content = response['Body'].read().decode('utf-8')
@@ -52,6 +61,78 @@ def load_template():
                 "Contact Information": {}
             }
 
+def split_template(template):
+    """
+    Separates the processing hints from the matchable sections of a template.
+    :param template: Loaded template dictionary.
+    :return: Tuple of (sections dictionary, hints dictionary).
+    """
+    hints = template.get(TEMPLATE_HINTS_KEY) or {}
+    sections = {key: value for key, value in template.items() if key != TEMPLATE_HINTS_KEY}
+    return sections, hints
+
+def template_field_paths(template):
+    """
+    Lists the paths of every field a template can fill, e.g. 'Statement/Meter #'.
+    Table specs count as a single field; so does a section that is itself a table spec.
+    :param template: Template sections (without hints).
+    :return: List of field paths.
+    """
+    paths = []
+    for section, section_template in template.items():
+        if isinstance(section_template, dict) and 'TableName' not in section_template:
+            paths.extend(f"{section}/{key}" for key in section_template)
+        else:
+            paths.append(section)
+    return paths
+
+def resolve_path(data, path):
+    """
+    Looks up a field path in matched or post-processed data.
+    :param data: Matched data dictionary.
+    :param path: Field path as returned by template_field_paths.
+    :return: The value at the path, or None if it is missing.
+    """
+    value = data
+    for part in path.split('/'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+class TemplateProgress:
+    """
+    Tracks which template fields have been filled as pages complete, so processing
+    can stop once the template is satisfied.
+    """
+
+    def __init__(self, template, required_paths=None):
+        self.required = set(required_paths or template_field_paths(template))
+        self.satisfied = set()
+
+    def update(self, page_data):
+        """
+        Records the fields filled by a page.
+        :param page_data: Matched or post-processed data of one page.
+        :return: Set of paths newly satisfied by this page.
+        """
+        newly_satisfied = set()
+        for path in self.required - self.satisfied:
+            value = resolve_path(page_data, path)
+            if value is not None and value != '' and value != [] and value != {}:
+                newly_satisfied.add(path)
+        self.satisfied |= newly_satisfied
+        return newly_satisfied
+
+    @property
+    def missing(self):
+        return sorted(self.required - self.satisfied)
+
+    @property
+    def complete(self):
+        return self.satisfied >= self.required
+
+@lru_cache(maxsize=4096)
 def clean_key(key):
     """
     Cleans a key string by removing non-alphanumeric characters and converting to lower case.
@@ -62,25 +143,42 @@ def clean_key(key):
     logger.debug(f"Cleaned key: '{key}' -> '{clean_key}'")
     return clean_key
 
-def match_template(processed_kv, parsed_tables):
+@timed("MatchTemplate")
+def match_template(processed_kv, parsed_tables, include_tables=True, template=None):
     """
     Matches the processed key-value pairs and tables against the template.
     :param processed_kv: Dictionary of processed key-value pairs.
     :param parsed_tables: List of parsed tables.
+    :param include_tables: Match tables too; the pipeline passes False and matches tables
+                           once per document through a TableIndex instead.
+    :param template: Template to match against; loaded with load_template() when omitted.
     :return: Matched data as a dictionary.
     """
     logger.info("Starting template matching process")
-    template = load_template()
+    template = template if template is not None else load_template()
+    aliases.use(template)
+    template, _ = split_template(template)
     if not template:
         logger.error("No template loaded. Exiting the matching process.")
         return {}
 
+    table_index = None
+    if include_tables:
+        table_index = TableIndex(template)
+        table_index.add_page(1, parsed_tables)
+
     matched_data = {}
     try:
         for section, section_template in template.items():
             logger.info(f"Matching section: {section}")
-            if isinstance(section_template, dict):
-                matched_data[section] = match_section(processed_kv, parsed_tables, section_template)
+            if isinstance(section_template, dict) and 'TableName' in section_template:
+                # The whole section is a table spec (e.g. Analysis, Fees)
+                matched_table = table_index.get(section) if table_index else None
+                if matched_table:
+                    matched_data[section] = matched_table
+                    logger.info(f"Matched table for section '{section}' with {len(matched_table)} rows.")
+            elif isinstance(section_template, dict):
+                matched_data[section] = match_section(processed_kv, table_index, section, section_template)
             else:
                 matched_value = find_matching_value(processed_kv, section)
                 if matched_value is not None:
@@ -93,11 +191,12 @@ def match_template(processed_kv, parsed_tables):
     logger.debug(f"Matched data: {matched_data}")
     return matched_data
 
-def match_section(processed_kv, parsed_tables, section_template):
+def match_section(processed_kv, table_index, section, section_template):
     """
     Matches a section of the template with key-value pairs and tables.
     :param processed_kv: Dictionary of processed key-value pairs.
-    :param parsed_tables: List of parsed tables.
+    :param table_index: TableIndex of the parsed tables, or None to skip tables.
+    :param section: Name of the section.
     :param section_template: Template section to match.
     :return: Matched section data as a dictionary.
     """
@@ -107,7 +206,7 @@ def match_section(processed_kv, parsed_tables, section_template):
         for key, value_type in section_template.items():
             logger.info(f"Matching key: '{key}' with value type: '{value_type}'")
             if isinstance(value_type, dict) and 'TableName' in value_type:
-                matched_table = find_matching_table(parsed_tables, value_type['TableName'])
+                matched_table = table_index.get(f"{section}/{key}") if table_index else None
                 if matched_table:
                     section_data[key] = matched_table
                     logger.info(f"Matched table for key '{key}' with template table name '{value_type['TableName']}'.")
@@ -121,6 +220,10 @@ def match_section(processed_kv, parsed_tables, section_template):
 
     return section_data
 
+def is_key_match(template_key, ratio):
+    """Applies the similarity threshold a key must exceed to match template_key."""
+    return ratio > 0.7 or (template_key == "Total Producer Payment" and ratio > 0.5)
+
 def find_matching_value(kv_pairs, template_key):
     """
     Finds the best matching value for a given template key from the provided key-value pairs.
@@ -130,25 +233,43 @@ def find_matching_value(kv_pairs, template_key):
     """
     logger.info(f"Finding matching value for template key: '{template_key}'")
     best_match = None
+    best_key = None
     best_ratio = 0
     clean_template_key = clean_key(template_key)
 
     try:
-        # Iterate over all key-value pairs to find the best match
+        # Keys seen before take their score from the learned alias table instead of being fuzzy matched
+        known = aliases.lookup(template_key, {clean_key(key) for key in kv_pairs})
+
+        # Iterate over all key-value pairs to find the best match, skipping keys known to fall below the threshold.
+        # Known aliases compete with unseen keys, so a better key that has not been seen yet still wins.
+        rejected = []
         for key, value in kv_pairs.items():
             clean_key_name = clean_key(key)
-            ratio = SequenceMatcher(None, clean_template_key, clean_key_name).ratio()
-            logger.debug(f"Comparing '{clean_template_key}' with '{clean_key_name}' - Similarity Ratio: {ratio}")
+            if clean_key_name in known:
+                ratio = known[clean_key_name]
+            elif aliases.is_rejected(template_key, clean_key_name):
+                continue
+            else:
+                ratio = SequenceMatcher(None, clean_template_key, clean_key_name).ratio()
+                increment("FuzzyComparisons")
+                logger.debug(f"Comparing '{clean_template_key}' with '{clean_key_name}' - Similarity Ratio: {ratio}")
+                if not is_key_match(template_key, ratio):
+                    rejected.append(clean_key_name)
 
             # Update the best match if the current ratio is the highest
             if ratio > best_ratio:
                 best_ratio = ratio
                 best_match = value
+                best_key = clean_key_name
                 logger.debug(f"New best match found: '{clean_key_name}' with ratio {ratio} for key '{template_key}'")
 
+        aliases.reject(template_key, rejected)
+
         # Apply thresholds to determine if the match is strong enough
-        if best_ratio > 0.7 or (template_key == "Total Producer Payment" and best_ratio > 0.5):
+        if is_key_match(template_key, best_ratio):
             logger.info(f"Best match for '{template_key}' found with ratio {best_ratio}. Matched value: {best_match}")
+            aliases.record(template_key, best_key, best_ratio)
             return best_match
         else:
             logger.info(f"No suitable match found for '{template_key}' (Best ratio: {best_ratio}). Returning None.")
@@ -157,35 +278,6 @@ def find_matching_value(kv_pairs, template_key):
     except Exception as e:
         logger.error(f"Error finding matching value for '{template_key}': {e}", exc_info=True)
         return None
-def find_matching_table(tables, table_name):
-    """
-    Finds the best matching table from the provided tables based on the given table name.
-    :param tables: List of tables extracted from the document.
-    :param table_name: The name of the table as specified in the template.
-    :return: The best matching table or None if no suitable match is found.
-    """
-    logger.info(f"Finding matching table for template table name: '{table_name}'")
-
-    try:
-        for table in tables:
-            # Check if the table structure is as expected (list of lists)
-            if table and isinstance(table, list) and len(table) > 0:
-                if isinstance(table[0], list) and len(table[0]) > 0:
-                    first_cell = table[0][0] if table[0][0] else ''
-                    ratio = SequenceMatcher(None, table_name.lower(), first_cell.lower()).ratio()
-                    logger.debug(f"Comparing table name '{table_name}' with first cell '{first_cell}' - Similarity Ratio: {ratio}")
-
-                    # Consider a match if the similarity ratio is above the threshold
-                    if ratio > 0.8:
-                        logger.info(f"Matched table for '{table_name}' with ratio {ratio}. Table found with {len(table)} rows.")
-                        return table
-                else:
-                    logger.warning(f"Unexpected table structure for '{table_name}': {table}")
-    except Exception as e:
-        logger.error(f"Error finding matching table for '{table_name}': {e}", exc_info=True)
-
-    logger.info(f"No suitable table match found for '{table_name}'.")
-    return None
 
 def convert_value(value, value_type):
     """
@@ -3,39 +3,81 @@ from botocore.exceptions import ClientError
 import os
 import logging
 import watchtower
+from config import CLOUDWATCH_LOGS, AWS_REGION, TEXTRACT_FEATURES
+from src.metrics import timed, increment
 
 # Set up CloudWatch logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-logger.addHandler(watchtower.CloudWatchLogHandler())
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
 
 # Initialize Textract client
-textract = boto3.client('textract', region_name=os.getenv('REGION_NAME'))
+textract = boto3.client('textract', region_name=os.getenv('REGION_NAME', AWS_REGION))
 
-def analyze_document(jpg_file, bucket):
+@timed("AnalyzeDocument")
+def analyze_document(jpg_file, bucket, feature_types=None, client=None):
     """
     Analyze a document using Amazon Textract.
     
     :param jpg_file: S3 key of the JPG file to analyze
     :param bucket: S3 bucket name
+    :param feature_types: Textract FeatureTypes to request, defaults to TEXTRACT_FEATURES
+    :param client: Textract client to use instead of the module client (e.g. a local stub)
     :return: Textract response or None if an error occurs
     """
+    feature_types = feature_types or TEXTRACT_FEATURES
+    client = client or textract
     try:
-        logger.info(f"Analyzing document: s3://{bucket}/{jpg_file}")
-        response = textract.analyze_document(
+        logger.info(f"Analyzing document: s3://{bucket}/{jpg_file} with features {feature_types}")
+        response = client.analyze_document(
             Document={
                 'S3Object': {
                     'Bucket': bucket,
                     'Name': jpg_file
                 }
             },
-            FeatureTypes=["TABLES", "FORMS"]
+            FeatureTypes=feature_types
         )
         logger.info(f"Document analysis completed for: s3://{bucket}/{jpg_file}")
+        increment("TextractCalls")
+        increment("Blocks", len(response.get('Blocks', [])))
         return response
     except ClientError as e:
         logger.error(f"An error occurred while analyzing document s3://{bucket}/{jpg_file}: {e}")
+        increment("TextractErrors")
         return None
     except Exception as e:
         logger.error(f"An unexpected error occurred while analyzing document s3://{bucket}/{jpg_file}: {e}")
+        increment("TextractErrors")
+        return None
+
+@timed("DetectDocumentText")
+def detect_document_text(image_bytes=None, client=None, jpg_file=None, bucket=None):
+    """
+    Detect plain text (LINE and WORD blocks) in an image using Amazon Textract.
+
+    :param image_bytes: JPEG or PNG bytes, e.g. a cropped page region
+    :param client: Textract client to use instead of the module client (e.g. a local stub)
+    :param jpg_file: S3 key of the image to read instead of image_bytes
+    :param bucket: S3 bucket name of jpg_file
+    :return: Textract response or None if an error occurs
+    """
+    client = client or textract
+    if jpg_file:
+        document = {'S3Object': {'Bucket': bucket, 'Name': jpg_file}}
+    else:
+        document = {'Bytes': image_bytes}
+    try:
+        response = client.detect_document_text(Document=document)
+        increment("TextractCalls")
+        increment("Blocks", len(response.get('Blocks', [])))
+        return response
+    except ClientError as e:
+        logger.error(f"An error occurred while detecting text: {e}")
+        increment("TextractErrors")
+        return None
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while detecting text: {e}")
+        increment("TextractErrors")
         return None
\ No newline at end of file
@@ -0,0 +1,46 @@
+import json
+import logging
+import watchtower
+import os
+from config import CLOUDWATCH_LOGS
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+class LocalTextractClient:
+    """
+    Offline stand-in for the boto3 Textract client.
+    Responses are replayed from '<responses_dir>/<page image stem>.json' files
+    (e.g. saved AnalyzeDocument output); pages without a recorded response get an empty one.
+    """
+
+    def __init__(self, responses_dir=None):
+        self.responses_dir = responses_dir
+        self.calls = 0
+
+    def load_response(self, name):
+        stem = os.path.splitext(os.path.basename(name))[0]
+        if self.responses_dir:
+            path = os.path.join(self.responses_dir, f"{stem}.json")
+            if os.path.exists(path):
+                with open(path, 'r') as file:
+                    return json.load(file)
+        logger.debug(f"No recorded Textract response for '{stem}', returning an empty response")
+        return {"DocumentMetadata": {"Pages": 1}, "Blocks": []}
+
+    def analyze_document(self, Document, FeatureTypes=None, **kwargs):
+        self.calls += 1
+        return self.load_response(Document['S3Object']['Name'])
+
+    def detect_document_text(self, Document, **kwargs):
+        self.calls += 1
+        if 'S3Object' in Document:
+            return self.load_response(Document['S3Object']['Name'])
+        # In-memory crops have no name to look a recording up by
+        return {"DocumentMetadata": {"Pages": 1}, "Blocks": []}
+
+# Log a message when the module is loaded
+logger.info("Textract stub module loaded successfully")
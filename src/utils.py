@@ -1,11 +1,13 @@
 import logging
 import watchtower
+from config import CLOUDWATCH_LOGS
 import os
 
 # Set up CloudWatch logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-logger.addHandler(watchtower.CloudWatchLogHandler())
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
 
 def get_text(result, blocks_map):
     text = ''
@@ -42,6 +44,16 @@ def find_word_boundingbox(findword, response):
                 }
     return word_find
 
+def in_range(box, top, left, word_height, no_line_below, no_line_above=0, right=1, margin=0.02):
+    """
+    Checks whether a BoundingBox starts within no_line_above/no_line_below lines of top,
+    right of left, and ends before right (normalized page coordinates).
+    """
+    return (box['Top'] >= top - no_line_above * word_height - margin * top and
+            box['Top'] <= top + no_line_below * word_height + margin * word_height and
+            box['Left'] >= left - margin * left and
+            box['Left'] + box['Width'] <= right + margin * right)
+
 def find_Key_value_inrange(response, top, left, word_height, no_line_below, no_line_above=0, right=1, margin=0.02):
     blocks = response['Blocks']
     key_map, value_map, block_map = {}, {}, {}
@@ -61,14 +73,8 @@ def find_Key_value_inrange(response, top, left, word_height, no_line_below, no_l
         if value_block:
             key = get_text(key_block, block_map)
             val = get_text(value_block, block_map)
-            vb_top = value_block['Geometry']['BoundingBox']['Top']
-            vb_left = value_block['Geometry']['BoundingBox']['Left']
-            vb_width = value_block['Geometry']['BoundingBox']['Width']
-            
-            if (vb_top >= top - no_line_above * word_height - margin * top and
-                vb_top <= top + no_line_below * word_height + margin * word_height and
-                vb_left >= left - margin * left and
-                vb_left + vb_width <= right + margin * right):
+            if in_range(value_block['Geometry']['BoundingBox'], top, left, word_height,
+                        no_line_below, no_line_above, right, margin):
                 kv_pair[key] = val
     
     return kv_pair
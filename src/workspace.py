@@ -0,0 +1,180 @@
+import os
+import errno
+import shutil
+import logging
+import tempfile
+import watchtower
+from config import (CLOUDWATCH_LOGS, WORKSPACE_ROOT, WORKSPACE_MODE, WORKSPACE_BUDGET_BYTES, WORKSPACE_MEMORY_ROOT,
+                    WORKSPACE_MEMORY_BUDGET_BYTES)
+from src.metrics import increment
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+class WorkspaceBudgetExceeded(OSError):
+    """Raised when a document's scratch files exceed the workspace byte budget."""
+
+    def __init__(self, used, budget):
+        super().__init__(errno.ENOSPC, f"Workspace budget exceeded: {used} of {budget} bytes used")
+
+# Windows access right, error and exit codes used by pid_alive
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_ACCESS_DENIED = 5
+STILL_ACTIVE = 259
+
+def pid_alive(pid):
+    """
+    Tells whether a process is still running. On Windows os.kill(pid, 0) would send the
+    process a CTRL_C_EVENT rather than probe it, so the process is looked up instead.
+    """
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # Access denied means the process exists but belongs to another user
+            return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, files in os.walk(path) for name in files
+               if os.path.isfile(os.path.join(directory, name)))
+
+def reclaim_stale(root):
+    """
+    Deletes workspaces left behind by processes that no longer run, e.g. an invocation
+    that timed out before it could clean up.
+    :return: Number of bytes reclaimed.
+    """
+    if not os.path.isdir(root):
+        return 0
+    reclaimed = 0
+    for name in os.listdir(root):
+        owner = name.partition('-')[0]
+        path = os.path.join(root, name)
+        if not owner.isdigit() or path in Workspace.active:
+            continue
+        if int(owner) != os.getpid() and pid_alive(int(owner)):
+            continue
+        reclaimed += directory_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Reclaimed stale workspace {path}")
+    return reclaimed
+
+def memory_root_available(root=WORKSPACE_MEMORY_ROOT):
+    return bool(root) and os.path.isdir(root) and os.access(root, os.W_OK)
+
+class Workspace:
+    """
+    Isolated scratch directory for one document, used as a context manager.
+
+    Every file written into it is tracked against a byte budget, files can be deleted as
+    soon as they are consumed, and the whole directory is removed on exit whether the
+    document succeeded or failed. Documents whose expected footprint fits the memory
+    budget are placed on a RAM-backed filesystem (WORKSPACE_MEMORY_ROOT, e.g. /dev/shm)
+    when one is available; everything else goes to disk under WORKSPACE_ROOT.
+    """
+
+    # Workspaces open in this process, never reclaimed as stale
+    active = set()
+
+    def __init__(self, name, expected_bytes=None, mode=WORKSPACE_MODE, root=WORKSPACE_ROOT):
+        """
+        :param name: Document name, used in the directory name.
+        :param expected_bytes: Estimated scratch footprint, used by mode 'auto'.
+        :param mode: 'disk', 'memory' or 'auto'.
+        :param root: Parent directory of disk-backed workspaces.
+        """
+        self.in_memory = mode == 'memory' or (
+            mode == 'auto' and expected_bytes is not None and expected_bytes <= WORKSPACE_MEMORY_BUDGET_BYTES)
+        if self.in_memory and not memory_root_available():
+            logger.info(f"Memory-backed root {WORKSPACE_MEMORY_ROOT} is not available; using disk")
+            self.in_memory = False
+        self.root = os.path.join(WORKSPACE_MEMORY_ROOT, 'workspaces') if self.in_memory else root
+        self.budget = WORKSPACE_MEMORY_BUDGET_BYTES if self.in_memory else WORKSPACE_BUDGET_BYTES
+        self.name = name
+        self.path = None
+        self.files = {}
+        self.used = 0
+        self.peak = 0
+        self.released = 0
+
+    def __enter__(self):
+        os.makedirs(self.root, exist_ok=True)
+        increment("WorkspaceReclaimedBytes", reclaim_stale(self.root))
+        # The owning pid prefixes the directory so stale workspaces can be recognized
+        self.path = tempfile.mkdtemp(prefix=f"{os.getpid()}-{self.name}-", dir=self.root)
+        Workspace.active.add(self.path)
+        logger.info(f"Created {'memory' if self.in_memory else 'disk'}-backed workspace {self.path} "
+                    f"with a budget of {self.budget} bytes")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+        return False
+
+    def file(self, name):
+        """Returns the path of a file inside the workspace."""
+        return os.path.join(self.path, name)
+
+    def folder(self, name):
+        """Creates and returns a folder inside the workspace."""
+        path = os.path.join(self.path, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def track(self, path):
+        """
+        Accounts for a file written into the workspace.
+        :raises WorkspaceBudgetExceeded: if the workspace now exceeds its budget.
+        """
+        size = os.path.getsize(path)
+        self.used += size - self.files.get(path, 0)
+        self.files[path] = size
+        self.peak = max(self.peak, self.used)
+        if self.used > self.budget:
+            raise WorkspaceBudgetExceeded(self.used, self.budget)
+        return path
+
+    def release(self, path):
+        """Deletes a consumed file and returns its space to the budget."""
+        if not path or not os.path.exists(path):
+            return
+        size = self.files.pop(path, None)
+        if size is None:
+            size = os.path.getsize(path)
+        else:
+            self.used -= size
+        os.remove(path)
+        self.released += size
+
+    def cleanup(self):
+        """Removes the workspace and records its disk usage metrics."""
+        if self.path is None:
+            return
+        shutil.rmtree(self.path, ignore_errors=True)
+        Workspace.active.discard(self.path)
+        increment("WorkspacePeakBytes", self.peak)
+        increment("WorkspaceReleasedBytes", self.released)
+        increment("ScratchFreeBytes", shutil.disk_usage(self.root).free)
+        logger.info(f"Removed workspace {self.path} (peak {self.peak} bytes, {self.released} bytes released early)")
+        self.path = None
+
+# Log a message when the module is loaded
+logger.info("Workspace module loaded successfully")
@@ -0,0 +1,199 @@
+import re
+import logging
+import watchtower
+from config import CLOUDWATCH_LOGS
+from src.utils import in_range
+from src.template_matching import resolve_path, convert_value, template_field_paths
+from src.textract_api import detect_document_text
+from src.metrics import timed, increment
+
+# Set up CloudWatch logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+if CLOUDWATCH_LOGS:
+    logger.addHandler(watchtower.CloudWatchLogHandler())
+
+# Same default margin as find_Key_value_inrange
+ZONE_MARGIN = 0.02
+
+def normalize_token(text):
+    # Keep '#' and '%' so 'Meter #' and 'Meter Name' stay distinct anchors
+    return re.sub(r'[^a-z0-9#%]', '', (text or '').lower())
+
+def page_words(response):
+    """
+    Lists the WORD blocks of a DetectDocumentText response in reading order (line by line).
+    :return: List of (normalized text, word block) tuples.
+    """
+    block_map = {block['Id']: block for block in response.get('Blocks', [])}
+    words = []
+    for block in response.get('Blocks', []):
+        if block['BlockType'] != 'LINE':
+            continue
+        for relationship in block.get('Relationships', []):
+            if relationship['Type'] == 'CHILD':
+                words.extend((normalize_token(block_map[word_id]['Text']), block_map[word_id])
+                             for word_id in relationship['Ids'] if word_id in block_map)
+    return words
+
+def union_box(blocks):
+    boxes = [block['Geometry']['BoundingBox'] for block in blocks]
+    left = min(box['Left'] for box in boxes)
+    top = min(box['Top'] for box in boxes)
+    right = max(box['Left'] + box['Width'] for box in boxes)
+    bottom = max(box['Top'] + box['Height'] for box in boxes)
+    return {'Left': left, 'Top': top, 'Width': right - left, 'Height': bottom - top}
+
+def find_anchor(words, anchor, occurrence=1):
+    """
+    Finds the bounding box of an anchor label such as 'Meter #'.
+    Trailing punctuation-only words (e.g. a separate ':') are included in the anchor.
+    :param words: Words as returned by page_words.
+    :param anchor: Anchor text.
+    :param occurrence: Which match to use, 1-based.
+    :return: BoundingBox of the anchor, or None if it is not on the page.
+    """
+    tokens = [token for token in (normalize_token(part) for part in anchor.split()) if token]
+    if not tokens:
+        return None
+    found = 0
+    for start in range(len(words) - len(tokens) + 1):
+        if [text for text, _ in words[start:start + len(tokens)]] != tokens:
+            continue
+        found += 1
+        if found < occurrence:
+            continue
+        end = start + len(tokens)
+        while end < len(words) and not words[end][0]:
+            end += 1
+        return union_box([block for _, block in words[start:end]])
+    return None
+
+def read_zone(words, spec):
+    """
+    Reads the text of one anchor-relative zone.
+
+    The zone starts at the anchor's right edge ("Direction": "right", the default) or at
+    the line below it ("Direction": "below"), spans "Width" of the page (to the right edge
+    by default) and "LinesBelow"/"LinesAbove" anchor heights, using the same range test
+    as find_Key_value_inrange. A "right" zone allows half an anchor height either way, so
+    a value on the anchor's line is found even if its box sits slightly higher or lower.
+    :param words: Words as returned by page_words.
+    :param spec: Zone spec from the template's Zones hint.
+    :return: Text of the words inside the zone, or None if the anchor is not found.
+    """
+    anchor = find_anchor(words, spec['Anchor'], spec.get('Occurrence', 1))
+    if anchor is None:
+        return None
+    height = anchor['Height']
+    if spec.get('Direction', 'right') == 'below':
+        top, left = anchor['Top'] + height, anchor['Left']
+        lines_below = spec.get('LinesBelow', 1)
+    else:
+        # Words on the same line rarely share the anchor's exact Top; centre the window on the anchor's line
+        top, left = anchor['Top'] - height / 2, anchor['Left'] + anchor['Width']
+        lines_below = spec.get('LinesBelow', 0) + 1
+    right = left + spec['Width'] if 'Width' in spec else 1
+    margin = spec.get('Margin', ZONE_MARGIN)
+
+    # The zone starts past the anchor, so the anchor's own words never fall inside it
+    selected = [block for _, block in words
+                if in_range(block['Geometry']['BoundingBox'], top, left, height, lines_below,
+                            spec.get('LinesAbove', 0), right, margin)]
+    selected.sort(key=lambda block: (round(block['Geometry']['BoundingBox']['Top'] / height),
+                                     block['Geometry']['BoundingBox']['Left']))
+    return ' '.join(block['Text'] for block in selected).strip(' :')
+
+def validate_zone(text, value_type, pattern=None):
+    """
+    Validates a zone's text against the template value type and an optional regex.
+    :return: The converted value, or None if the text is not a valid value.
+    """
+    if not text or (pattern and not re.fullmatch(pattern, text)):
+        return None
+    if value_type in ('float', 'int', 'float_dollar', 'float_percentage'):
+        return convert_value(text, value_type)
+    return text
+
+def set_path(data, path, value):
+    section, _, key = path.partition('/')
+    if key:
+        data.setdefault(section, {})[key] = value
+    else:
+        data[section] = value
+
+def merge_zone_data(matched_data, zone_data):
+    """
+    Overlays validated zone values on matched data; zone values take precedence.
+    """
+    for section, value in zone_data.items():
+        if isinstance(value, dict) and isinstance(matched_data.get(section), dict):
+            matched_data[section].update(value)
+        else:
+            matched_data[section] = value
+    return matched_data
+
+class ZoneExtractor:
+    """
+    Fills template fields from anchor-relative zones declared in the template's
+    "Zones" hint, e.g. {"Statement/Meter #": {"Page": 1, "Anchor": "Meter #", "Width": 0.2}}.
+    Zones are read from a DetectDocumentText response, which costs a fraction of
+    FORMS+TABLES analysis; fields whose zones fail validation are left to AnalyzeDocument.
+    """
+
+    def __init__(self, template, zones):
+        self.template = template
+        self.zones = zones
+        self.pages = {spec.get('Page', 1) for spec in zones.values()}
+        # Key-value fields of the template; tables come from TABLES analysis, not from zones
+        self.form_fields = {path for path in template_field_paths(template)
+                            if not isinstance(resolve_path(template, path), dict)}
+
+    def covers(self, page_number):
+        return page_number in self.pages
+
+    def covers_forms(self, page_number):
+        """Tells whether the zones of a page cover every key-value field of the template, so FORMS can be dropped."""
+        return self.form_fields <= set(self.page_zones(page_number))
+
+    def page_zones(self, page_number):
+        return {path: spec for path, spec in self.zones.items() if spec.get('Page', 1) == page_number}
+
+    @timed("ZoneExtraction")
+    def extract(self, response, page_number):
+        """
+        Reads and validates the zones of one page.
+        :param response: DetectDocumentText (or AnalyzeDocument) response of the page.
+        :param page_number: 1-based page number.
+        :return: Tuple of (zone data in match_template shape, list of field paths that failed validation).
+        """
+        words = page_words(response)
+        zones = self.page_zones(page_number)
+        zone_data = {}
+        failed = []
+        for path, spec in zones.items():
+            text = read_zone(words, spec)
+            value = validate_zone(text, resolve_path(self.template, path), spec.get('Pattern'))
+            if value is None:
+                logger.info(f"Zone for '{path}' on page {page_number} failed validation: {text!r}")
+                failed.append(path)
+                continue
+            set_path(zone_data, path, value)
+        increment("ZoneFields", len(zones) - len(failed))
+        increment("ZoneFailures", len(failed))
+        return zone_data, failed
+
+    def read_page(self, jpg_file, bucket, page_number, textract_client=None):
+        """
+        Runs DetectDocumentText on an uploaded page and extracts its zones.
+        :return: Tuple of (zone data, failed field paths, DetectDocumentText response); every zone
+                 fails and the response is None if text detection fails.
+        """
+        response = detect_document_text(client=textract_client, jpg_file=jpg_file, bucket=bucket)
+        if not response:
+            return {}, list(self.page_zones(page_number)), None
+        zone_data, failed = self.extract(response, page_number)
+        return zone_data, failed, response
+
+# Log a message when the module is loaded
+logger.info("Zone extraction module loaded successfully")
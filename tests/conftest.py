@@ -0,0 +1,89 @@
+import os
+import json
+
+import pytest
+from PIL import Image, ImageDraw
+
+# Keep test runs local: no CloudWatch handler and a fixed region for the boto3 clients created at import
+os.environ.setdefault('CLOUDWATCH_LOGS', 'false')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+def key_value_blocks(pairs):
+    """
+    Builds the KEY_VALUE_SET, LINE and WORD blocks of an AnalyzeDocument response, one line per pair,
+    so the same response serves FORMS parsing and zone reading.
+    :param pairs: Dictionary of key text to value text, e.g. {'Meter #': '12345'}.
+    """
+    blocks = []
+    for line, (key, value) in enumerate(pairs.items()):
+        top = 0.1 + 0.05 * line
+        for kind, text, left in (("KEY", key, 0.1), ("VALUE", value, 0.4)):
+            word_ids = []
+            for number, word in enumerate(text.split()):
+                word_ids.append(f"{kind.lower()}-word-{line}-{number}")
+                blocks.append({"BlockType": "WORD", "Id": word_ids[-1], "Text": word,
+                               "Geometry": {"BoundingBox": {"Top": top, "Left": left + 0.06 * number,
+                                                            "Width": 0.05, "Height": 0.02}}})
+            geometry = {"BoundingBox": {"Top": top, "Left": left, "Width": 0.06 * len(word_ids), "Height": 0.02}}
+            blocks.append({"BlockType": "LINE", "Id": f"{kind.lower()}-line-{line}", "Text": text, "Geometry": geometry,
+                           "Relationships": [{"Type": "CHILD", "Ids": word_ids}]})
+            blocks.append({"BlockType": "KEY_VALUE_SET", "Id": f"{kind.lower()}-{line}", "EntityTypes": [kind],
+                           "Geometry": geometry, "Relationships": [{"Type": "CHILD", "Ids": word_ids}]})
+        key_block = next(block for block in blocks if block["Id"] == f"key-{line}")
+        key_block["Relationships"].append({"Type": "VALUE", "Ids": [f"value-{line}"]})
+    return blocks
+
+def draw_statement_page(page_number=1, blank=False):
+    """
+    Draws a statement page with ruled rows, or a blank one.
+    :return: RGB page image.
+    """
+    image = Image.new("L", (850, 1100), 255)
+    if not blank:
+        draw = ImageDraw.Draw(image)
+        for row in range(20):
+            draw.rectangle([80, 100 + row * 40, 770, 110 + row * 40], fill=0)
+        draw.text((100, 60), f"Statement page {page_number}", fill=0)
+    return image.convert("RGB")
+
+@pytest.fixture
+def statement_page(tmp_path):
+    """
+    Writes a rendered statement page image.
+    :return: Function taking the file name, page number and blank flag and returning the image path.
+    """
+    def write(name="0_statement.jpg", page_number=1, blank=False):
+        path = tmp_path / name
+        draw_statement_page(page_number, blank).save(path)
+        return str(path)
+    return write
+
+@pytest.fixture
+def statement_pdf(tmp_path):
+    """
+    Writes a statement PDF with visible content on every page, so triage does not skip them.
+    :return: Function taking the file name, page count and 1-based numbers of blank pages and returning the PDF path.
+    """
+    def write(name="statement.pdf", pages=1, blank_pages=()):
+        folder = tmp_path / "statements"
+        folder.mkdir(exist_ok=True)
+        images = [draw_statement_page(page, page in blank_pages) for page in range(1, pages + 1)]
+        path = folder / name
+        images[0].save(path, save_all=True, append_images=images[1:], resolution=100)
+        return str(path)
+    return write
+
+@pytest.fixture
+def recorded_responses(tmp_path):
+    """
+    Records AnalyzeDocument responses for LocalTextractClient.
+    :return: Function taking the page image stem and key-value pairs and returning the responses folder.
+    """
+    folder = tmp_path / "responses"
+    folder.mkdir()
+
+    def record(stem, pairs):
+        response = {"DocumentMetadata": {"Pages": 1}, "Blocks": key_value_blocks(pairs)}
+        (folder / f"{stem}.json").write_text(json.dumps(response))
+        return str(folder)
+    return record
@@ -0,0 +1,42 @@
+import json
+import os
+
+import batch_runner
+from src.result_index import ResultIndex
+from src.storage import document_id
+
+def test_offline_batch_run(tmp_path, statement_pdf, recorded_responses):
+    pdf_path = statement_pdf("statement.pdf")
+    responses_dir = recorded_responses("0_statement.pdf", {"Meter #": "12345", "Operator": "Acme Energy"})
+    output_dir = tmp_path / "out"
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    index_path = tmp_path / "results.sqlite"
+
+    exit_code = batch_runner.main([os.path.dirname(pdf_path), "--offline", "--output-dir", str(output_dir),
+                                   "--responses-dir", responses_dir, "--checkpoint", str(checkpoint),
+                                   "--workers", "1", "--index", str(index_path)])
+
+    assert exit_code == 0
+    record = json.loads(checkpoint.read_text())
+    assert record["status"] == "ok"
+    assert record["pages"] == 1
+    result_path = output_dir / f"extraction_results/extraction_result_{document_id(pdf_path)}.json"
+    result = json.loads(result_path.read_text())
+    assert result["Statement"]["Meter #"] == "12345"
+    assert result["Statement"]["Operator"] == "Acme Energy"
+    with ResultIndex(str(index_path)) as index:
+        assert [entry["meter_no"] for entry in index.query(operator="acme energy")] == ["12345"]
+
+def test_offline_batch_run_resumes_from_checkpoint(tmp_path, statement_pdf, recorded_responses):
+    pdf_path = statement_pdf("statement.pdf")
+    responses_dir = recorded_responses("0_statement.pdf", {"Meter #": "12345"})
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    checkpoint.write_text(json.dumps({"document": pdf_path, "status": "ok"}) + "\n")
+
+    exit_code = batch_runner.main([os.path.dirname(pdf_path), "--offline", "--output-dir", str(tmp_path / "out"),
+                                   "--responses-dir", responses_dir, "--checkpoint", str(checkpoint),
+                                   "--workers", "1"])
+
+    assert exit_code == 0
+    assert len(checkpoint.read_text().splitlines()) == 1
+    assert not (tmp_path / "out" / "extraction_results").exists()
@@ -0,0 +1,107 @@
+import gzip
+import json
+
+from src.columnar_export import (STAGING_PREFIX, ColumnarExportBuffer, column_name, compact_staging,
+                                 flatten_result, partition_path, stage_records)
+from src.storage import LocalStorage
+
+TEMPLATE = {
+    "Statement": {"Meter #": "string", "Operator": "string", "Production Date": "date"},
+    "Analysis": {"TableName": "Analysis", "ColumnNames": ["Component", "Mol %", "GPM"]}
+}
+
+def statement_result(meter="12345", date="2024-01-31"):
+    return {
+        "Statement": {"Meter #": meter, "Operator": "Acme Energy", "Production Date": date},
+        "Analysis": [
+            {"value": ["Analysis", "", ""]},
+            {"value": ["Component", "Mol %", "GPM"]},
+            {"value": ["Methane", "85.20", "1,234.5"]},
+            {"value": ["Ethane", "", "n/a"]}
+        ]
+    }
+
+def read_ndjson(storage, key):
+    return [json.loads(line) for line in gzip.decompress(storage.get_object(key)).decode('utf-8').splitlines()]
+
+def test_column_name():
+    assert column_name("Meter #") == "meter_no"
+    assert column_name("Producer %") == "producer_pct"
+    assert column_name("Production Date") == "production_date"
+
+def test_partition_path_falls_back_to_unknown():
+    assert partition_path("2024-01-31", "Acme Energy") == "production_date=2024-01-31/operator=acme_energy"
+    assert partition_path("January 2024", None) == "production_date=unknown/operator=unknown"
+
+def test_flatten_result_types_table_rows():
+    records = flatten_result(statement_result(), TEMPLATE, "statements/a.pdf")
+
+    assert records["statements"] == [{"source_key": "statements/a.pdf", "meter_no": "12345",
+                                      "operator": "Acme Energy", "production_date": "2024-01-31"}]
+    methane, ethane = records["analysis_components"]
+    assert methane["component"] == "Methane"
+    assert methane["mol_pct"] == 85.2
+    assert methane["gpm"] == 1234.5
+    assert methane["meter_no"] == "12345"
+    assert ethane["mol_pct"] is None and ethane["gpm"] is None
+
+def test_buffer_flushes_one_object_per_record_type_and_partition(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    buffer = ColumnarExportBuffer(storage, prefix="exports/", file_format="ndjson", max_records=100)
+    buffer.add(flatten_result(statement_result("1"), TEMPLATE, "a.pdf"))
+    buffer.add(flatten_result(statement_result("2"), TEMPLATE, "b.pdf"))
+    buffer.add(flatten_result(statement_result("3", "2024-02-29"), TEMPLATE, "c.pdf"))
+
+    assert not buffer.is_due()
+    written = buffer.flush()
+
+    assert len(written) == 4
+    january = [key for key in written if "production_date=2024-01-31" in key]
+    statements = next(key for key in january if key.startswith("exports/statements/"))
+    assert statements.endswith(".ndjson.gz")
+    assert [row["meter_no"] for row in read_ndjson(storage, statements)] == ["1", "2"]
+    assert buffer.record_count == 0 and buffer.groups == {}
+
+def test_buffer_is_due_at_max_records(tmp_path):
+    buffer = ColumnarExportBuffer(LocalStorage(str(tmp_path)), file_format="ndjson", max_records=3)
+
+    buffer.add(flatten_result(statement_result(), TEMPLATE, "a.pdf"))
+
+    assert buffer.is_due()
+    assert buffer.flush_if_due()
+
+def test_failed_write_keeps_rows_buffered(tmp_path):
+    class FailingStorage(LocalStorage):
+        def put_object(self, key, body):
+            raise IOError("disk full")
+
+    buffer = ColumnarExportBuffer(FailingStorage(str(tmp_path)), file_format="ndjson")
+    buffer.add(flatten_result(statement_result(), TEMPLATE, "a.pdf"))
+
+    assert buffer.flush() == []
+    assert buffer.record_count == 3
+
+def test_compact_staging_writes_columnar_objects_and_deletes_staged(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    for meter in ("1", "2", "3"):
+        assert stage_records(storage, flatten_result(statement_result(meter), TEMPLATE, f"{meter}.pdf"))
+
+    compacted, written = compact_staging(storage, max_records=6)
+
+    assert compacted == 3
+    assert list(storage.list_keys(STAGING_PREFIX)) == []
+    statements = [key for key in written if "/statements/" in key]
+    assert sorted(row["meter_no"] for key in statements for row in read_ndjson(storage, key)) == ["1", "2", "3"]
+
+def test_compact_staging_keeps_staged_objects_after_failed_write(tmp_path):
+    class ReadOnlyExports(LocalStorage):
+        def put_object(self, key, body):
+            if not key.startswith(STAGING_PREFIX):
+                raise IOError("access denied")
+            super().put_object(key, body)
+
+    storage = ReadOnlyExports(str(tmp_path))
+    stage_records(storage, flatten_result(statement_result(), TEMPLATE, "a.pdf"))
+
+    assert compact_staging(storage) == (0, [])
+    assert len(list(storage.list_keys(STAGING_PREFIX))) == 1
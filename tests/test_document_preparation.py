@@ -0,0 +1,63 @@
+import os
+import shutil
+
+import pytest
+
+import lambda_function
+from src import document_preparation
+from src.document_preparation import Pdf2JpgRenderer, PdfiumRenderer, get_renderer, iter_page_files
+from src.key_aliases import aliases
+from src.metrics import metrics
+from src.storage import LocalStorage
+from src.textract_stub import LocalTextractClient
+
+requires_pdfium = pytest.mark.skipif(document_preparation.pypdfium2 is None, reason="pypdfium2 is not installed")
+requires_pdf2jpg = pytest.mark.skipif(document_preparation.pdf2jpg is None or not shutil.which("java"),
+                                      reason="pdf2jpg needs a JRE")
+
+@requires_pdfium
+def test_pdfium_renders_requested_pages(statement_pdf):
+    pdf_path = statement_pdf("statement.pdf", pages=3)
+    renderer = PdfiumRenderer()
+
+    assert [page for page, _ in renderer.iter_pages(pdf_path, dpi=50)] == [1, 2, 3]
+    assert [page for page, _ in renderer.iter_pages(pdf_path, dpi=50, pages=[2])] == [2]
+    assert list(renderer.iter_pages(pdf_path, dpi=50, pages=[])) == []
+
+@requires_pdfium
+def test_iter_page_files_renders_lazily(tmp_path, statement_pdf):
+    pdf_path = statement_pdf("statement.pdf", pages=3)
+    tracked = []
+
+    page_files = iter_page_files(pdf_path, str(tmp_path / "pages"), dpi=50, renderer=PdfiumRenderer(),
+                                 on_page=tracked.append)
+    page_number, jpg_file = next(page_files)
+
+    assert page_number == 1
+    assert os.path.basename(jpg_file) == "0_statement.pdf.jpg"
+    assert tracked == [jpg_file]
+    assert os.listdir(os.path.dirname(jpg_file)) == ["0_statement.pdf.jpg"]
+    page_files.close()
+
+@requires_pdf2jpg
+def test_pdf2jpg_renders_requested_pages(statement_pdf):
+    pdf_path = statement_pdf("statement.pdf", pages=3)
+
+    assert [page for page, _ in Pdf2JpgRenderer().iter_pages(pdf_path, dpi=50, pages=[2, 3])] == [2, 3]
+
+def test_get_renderer_falls_back_to_installed_backend(monkeypatch):
+    monkeypatch.setitem(document_preparation.RENDERERS, "pdf2jpg", (Pdf2JpgRenderer, lambda: False))
+
+    assert isinstance(get_renderer("pdf2jpg"), PdfiumRenderer)
+
+@requires_pdfium
+def test_pipeline_times_rendering(tmp_path, monkeypatch, statement_pdf):
+    monkeypatch.setattr(aliases, "enabled", False)
+    metrics.start_invocation(True)
+    try:
+        lambda_function.process_document(statement_pdf("statement.pdf", pages=2), "statements/statement.pdf",
+                                         LocalStorage(str(tmp_path / "bucket")), LocalTextractClient(),
+                                         str(tmp_path / "pages"), template={"Statement": {"Meter #": "string"}})
+        assert metrics.timings["Render"] > 0
+    finally:
+        metrics.start_invocation()
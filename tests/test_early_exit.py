@@ -0,0 +1,77 @@
+import pytest
+
+import lambda_function
+from src.key_aliases import aliases
+from src.storage import LocalStorage, document_id
+from src.template_matching import TemplateProgress
+from src.textract_stub import LocalTextractClient
+
+SECTIONS = {"Statement": {"Meter #": "string", "Operator": "string"},
+            "Analysis": {"TableName": "Analysis", "ColumnNames": ["Component", "GPM", "Mol"]}}
+
+def test_template_progress_tracks_required_fields():
+    progress = TemplateProgress(SECTIONS)
+    assert progress.missing == ["Analysis", "Statement/Meter #", "Statement/Operator"]
+
+    assert progress.update({"Statement": {"Meter #": "12345", "Operator": ""}}) == {"Statement/Meter #"}
+    progress.update({"Statement": {"Operator": "Acme Energy"}, "Analysis": [{"value": ["c1", "0.1", "85.2"]}]})
+    assert progress.complete
+
+def test_template_progress_with_required_fields_hint():
+    progress = TemplateProgress(SECTIONS, ["Statement/Meter #"])
+
+    progress.update({"Statement": {"Meter #": "12345"}})
+
+    assert progress.complete
+
+@pytest.fixture
+def run_statement(tmp_path, monkeypatch, statement_pdf, recorded_responses):
+    """
+    Processes a three-page statement offline whose first page holds the meter number.
+    :return: Function taking the template hints and returning (stats, Textract client, uploaded page images).
+    """
+    monkeypatch.setattr(aliases, "enabled", False)
+    pdf_path = statement_pdf("statement.pdf", pages=3)
+    responses_dir = recorded_responses("0_statement.pdf", {"Meter #": "12345"})
+    storage = LocalStorage(str(tmp_path / "bucket"))
+
+    def run(hints):
+        client = LocalTextractClient(responses_dir)
+        template = {"Statement": {"Meter #": "string", "Operator": "string"}, "_Hints": hints}
+        _, stats = lambda_function.process_document(pdf_path, "statements/statement.pdf", storage, client,
+                                                    str(tmp_path / "pages"), template=template)
+        prefix = f"textract_input/{document_id('statements/statement.pdf')}/"
+        uploaded = sorted(key[len(prefix):] for key in storage.list_keys(prefix))
+        return stats, client, uploaded
+    return run
+
+def test_stops_once_required_fields_are_filled(run_statement, monkeypatch):
+    monkeypatch.setattr(lambda_function, "EARLY_EXIT_ENABLED", True)
+
+    stats, client, uploaded = run_statement({"RequiredFields": ["Statement/Meter #"]})
+
+    assert stats["stopped"] == "template satisfied"
+    assert stats["analyzed_pages"] == 1
+    assert client.calls == 1
+    assert uploaded == ["0_statement.pdf.jpg"]
+
+def test_runs_every_page_while_fields_are_missing(run_statement, monkeypatch):
+    monkeypatch.setattr(lambda_function, "EARLY_EXIT_ENABLED", True)
+
+    stats, client, _ = run_statement({})
+
+    assert "stopped" not in stats
+    assert client.calls == 3
+
+def test_max_pages_hint_caps_analyzed_pages(run_statement):
+    stats, client, uploaded = run_statement({"MaxPages": 2})
+
+    assert stats["stopped"] == "page limit 2 reached"
+    assert client.calls == 2
+    assert uploaded == ["0_statement.pdf.jpg", "1_statement.pdf.jpg"]
+
+def test_page_range_hint_skips_other_pages(run_statement):
+    stats, client, uploaded = run_statement({"PageRange": [2, 3]})
+
+    assert stats["analyzed_pages"] == 2
+    assert uploaded == ["1_statement.pdf.jpg", "2_statement.pdf.jpg"]
@@ -0,0 +1,151 @@
+import functools
+import json
+import os
+
+import pytest
+
+import lambda_function
+from src.fanout import LocalDispatcher, chunk_page_limits, count_pages, split_pdf
+from src.key_aliases import aliases
+from src.storage import LocalStorage, document_id
+from src.textract_stub import LocalTextractClient
+
+TEMPLATE = {
+    "Physical Information": {
+        "Volumes": {"TableName": "Volumes", "ColumnNames": ["Description", "Mcf", "MMBtu"]}
+    }
+}
+
+VOLUMES_HEADER = ["Description", "Mcf", "MMBtu"]
+
+def chunk_payload(task):
+    """Stands in for process_chunk: a Volumes table that starts in the first chunk and continues in the second."""
+    if task["first_page"] == 1:
+        page_tables = {"1": [], "2": [[VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]]}
+    else:
+        page_tables = {"3": [[["Net Delivered", "90", "95"]]]}
+    return {"first_page": task["first_page"], "results": [{"Statement": {"Page": str(task["first_page"])}}],
+            "page_tables": page_tables, "stats": {"pages": len(page_tables), "analyzed_pages": len(page_tables)}}
+
+def failing_chunk(task):
+    if task["first_page"] == 3:
+        raise RuntimeError("worker crashed")
+    return chunk_payload(task)
+
+TASKS = [{"key": "chunks/a/a_pages_0003-0003.pdf", "first_page": 3},
+         {"key": "chunks/a/a_pages_0001-0002.pdf", "first_page": 1}]
+
+def test_reduce_chunks_stitches_tables_across_chunks():
+    payloads = LocalDispatcher(chunk_payload, max_concurrency=2).map(TASKS)
+
+    result, stats = lambda_function.reduce_chunks(payloads, TEMPLATE)
+
+    volumes = [item["value"] for item in result["Physical Information"]["Volumes"]]
+    assert volumes == [VOLUMES_HEADER, ["Gross Wellhead", "100", "110"], ["Net Delivered", "90", "95"]]
+    assert stats == {"pages": 3, "analyzed_pages": 3, "chunks": 2, "failed_chunks": 0}
+
+def test_reduce_chunks_counts_failed_chunks():
+    payloads = LocalDispatcher(failing_chunk).map(TASKS)
+
+    result, stats = lambda_function.reduce_chunks(payloads, TEMPLATE)
+
+    volumes = [item["value"] for item in result["Physical Information"]["Volumes"]]
+    assert volumes == [VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]
+    assert stats["failed_chunks"] == 1
+    assert lambda_function.reduce_chunks([{"error": "timeout"}], TEMPLATE) == (None, {
+        "pages": 0, "analyzed_pages": 0, "chunks": 1, "failed_chunks": 1})
+
+def test_split_pdf_chunks_consecutive_pages(tmp_path, statement_pdf):
+    chunks = split_pdf(statement_pdf("statement.pdf", pages=3), str(tmp_path / "chunks"), chunk_pages=2)
+
+    assert [(chunk["first_page"], chunk["last_page"]) for chunk in chunks] == [(1, 2), (3, 3)]
+    assert [count_pages(chunk["path"]) for chunk in chunks] == [2, 1]
+    assert os.path.basename(chunks[1]["path"]) == "statement_pages_0003-0003.pdf"
+
+def test_process_document_fanout_matches_single_invocation(tmp_path, monkeypatch, statement_pdf, recorded_responses):
+    pdf_path = statement_pdf("statement.pdf", pages=3)
+    recorded_responses("0_statement_pages_0001-0002.pdf", {"Meter #": "12345"})
+    responses_dir = recorded_responses("0_statement_pages_0003-0003.pdf", {"Operator": "Acme Energy"})
+    storage = LocalStorage(str(tmp_path / "bucket"))
+    textract_client = LocalTextractClient(responses_dir)
+    monkeypatch.setattr(lambda_function, "split_pdf", functools.partial(split_pdf, chunk_pages=2))
+
+    def worker(task):
+        return lambda_function.process_chunk(task, storage, textract_client,
+                                             str(tmp_path / f"worker_{task['first_page']}"))
+
+    result, stats = lambda_function.process_document_fanout(pdf_path, "statements/statement.pdf",
+                                                            LocalDispatcher(worker, max_concurrency=2),
+                                                            storage, str(tmp_path / "coordinator"),
+                                                            template={"Statement": {"Meter #": "string",
+                                                                                    "Operator": "string"}})
+
+    assert result["Statement"]["Meter #"] == "12345"
+    assert result["Statement"]["Operator"] == "Acme Energy"
+    assert stats["chunks"] == 2
+    assert stats["failed_chunks"] == 0
+    assert stats["pages"] == 3
+
+def test_chunk_page_limits_split_the_document_limit():
+    chunks = [{"first_page": 1, "last_page": 2}, {"first_page": 3, "last_page": 4}, {"first_page": 5, "last_page": 6}]
+
+    assert chunk_page_limits(chunks, 0) == [0, 0, 0]
+    assert chunk_page_limits(chunks, 3) == [3, 1, None]
+    assert chunk_page_limits(chunks, 3, (3, 6)) == [3, 3, 1]
+
+@pytest.fixture
+def compare_runs(tmp_path, monkeypatch, statement_pdf):
+    """
+    Processes a four-page statement once in a single invocation and once fanned out in
+    two-page chunks, both offline with empty Textract responses.
+    :return: Function taking the template and returning the (stats, Textract calls, storage) of both runs.
+    """
+    monkeypatch.setattr(aliases, "enabled", False)
+    monkeypatch.setattr(lambda_function, "split_pdf", functools.partial(split_pdf, chunk_pages=2))
+    pdf_path = statement_pdf("statement.pdf", pages=4)
+
+    def run(template):
+        single_storage, single_client = LocalStorage(str(tmp_path / "single")), LocalTextractClient()
+        _, single_stats = lambda_function.process_document(pdf_path, "statements/statement.pdf", single_storage,
+                                                           single_client, str(tmp_path / "single_pages"),
+                                                           template=template)
+        fanout_storage, fanout_client = LocalStorage(str(tmp_path / "fanout")), LocalTextractClient()
+
+        def worker(task):
+            return lambda_function.process_chunk(task, fanout_storage, fanout_client,
+                                                 str(tmp_path / f"worker_{task['first_page']}"), template=template)
+
+        _, fanout_stats = lambda_function.process_document_fanout(pdf_path, "statements/statement.pdf",
+                                                                  LocalDispatcher(worker), fanout_storage,
+                                                                  str(tmp_path / "coordinator"), template)
+        return (single_stats, single_client.calls, single_storage), (fanout_stats, fanout_client.calls, fanout_storage)
+    return run
+
+def test_fanout_applies_page_hints_by_absolute_page(compare_runs):
+    template = {"Statement": {"Meter #": "string"}, "_Hints": {"PageFeatures": {"1": []}}}
+
+    (single_stats, single_calls, _), (fanout_stats, fanout_calls, _) = compare_runs(template)
+
+    assert single_stats["analyzed_pages"] == fanout_stats["analyzed_pages"] == 3
+    assert single_calls == fanout_calls == 3
+
+def test_fanout_splits_page_limit_across_chunks(compare_runs):
+    template = {"Statement": {"Meter #": "string"}, "_Hints": {"MaxPages": 1}}
+
+    (single_stats, single_calls, _), (fanout_stats, fanout_calls, _) = compare_runs(template)
+
+    assert single_calls == fanout_calls == 1
+    assert fanout_stats["chunks"] == 1
+    assert fanout_stats["stopped"] == "page limit 1 reached"
+
+def test_fanout_saves_one_triage_report(compare_runs):
+    template = {"Statement": {"Meter #": "string"}, "_Hints": {"PageFeatures": {"3": ["TABLES"]}}}
+
+    (_, _, single_storage), (_, _, fanout_storage) = compare_runs(template)
+
+    key = f"intermediate_results/{document_id('statements/statement.pdf')}/triage_report.json"
+    single_report = json.loads(single_storage.get_object(key))
+    fanout_report = json.loads(fanout_storage.get_object(key))
+    assert [decision["page"] for decision in fanout_report["decisions"]] == [1, 2, 3, 4]
+    assert fanout_report["feature_counts"] == single_report["feature_counts"]
+    assert fanout_report["decisions"][2]["reason"] == "template page hint"
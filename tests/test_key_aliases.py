@@ -0,0 +1,100 @@
+import json
+
+from src import key_aliases
+from src.key_aliases import AliasTable
+from src.storage import LocalStorage
+
+TEMPLATE = {"Statement": {"Meter #": "str"}}
+
+def make_table(storage):
+    table = AliasTable(enabled=True)
+    table.configure(storage)
+    table.use(TEMPLATE)
+    return table
+
+def test_merge_keeps_higher_score():
+    table = AliasTable(enabled=True)
+    table.merge({"Meter #": {"meter no": 0.8}})
+
+    assert table.merge({"Meter #": {"meter no": 0.7, "meter number": 0.9}}, {"Meter #": ["operator"]}) == 1
+    assert table.aliases == {"Meter #": {"meter no": 0.8, "meter number": 0.9}}
+    assert table.is_rejected("Meter #", "operator")
+
+def test_lookup_returns_known_aliases_on_the_page():
+    table = AliasTable(enabled=True)
+    table.merge({"Meter #": {"meter no": 0.8, "meter number": 0.9}})
+
+    assert table.lookup("Meter #", ["meter no", "operator"]) == {"meter no": 0.8}
+    assert table.lookup("Meter #", ["operator"]) == {}
+    assert table.lookup("Operator", ["meter no"]) == {}
+
+def test_disabled_table_never_matches():
+    table = AliasTable(enabled=False)
+    table.merge({"Meter #": {"meter no": 0.8}}, {"Meter #": ["operator"]})
+
+    assert table.lookup("Meter #", ["meter no"]) == {}
+    assert not table.is_rejected("Meter #", "operator")
+
+def test_concurrent_saves_are_all_kept(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    first, second = make_table(storage), make_table(storage)
+    first.record("Meter #", "meter no", 0.8)
+    second.record("Meter #", "meter number", 0.9)
+    second.reject("Meter #", ["operator"])
+
+    assert first.save()
+    assert second.save()
+    assert not second.save()
+
+    reloaded = make_table(storage)
+    assert reloaded.aliases == {"Meter #": {"meter no": 0.8, "meter number": 0.9}}
+    assert reloaded.is_rejected("Meter #", "operator")
+
+def test_new_template_version_starts_empty(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    table = make_table(storage)
+    table.record("Meter #", "meter no", 0.8)
+    table.save()
+
+    table.use({"Statement": {"Meter #": "str", "Operator": "str"}})
+    assert table.aliases == {}
+
+def test_save_writes_only_what_was_learned(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    table = make_table(storage)
+    table.record("Meter #", "meter no", 0.8)
+    table.save()
+    table.record("Meter #", "meter number", 0.9)
+    table.save()
+
+    segments = sorted(storage.list_keys(table.prefix()))
+    assert [json.loads(storage.get_object(key))["aliases"] for key in segments] == [
+        {"Meter #": {"meter no": 0.8}}, {"Meter #": {"meter number": 0.9}}]
+
+def test_unreadable_segment_does_not_drop_the_others(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    table = make_table(storage)
+    table.record("Meter #", "meter no", 0.8)
+    table.save()
+    storage.put_object(f"{table.prefix()}partial.json", '{"template_version": ')
+
+    reloaded = make_table(storage)
+    reloaded.record("Meter #", "meter number", 0.9)
+    reloaded.save()
+
+    assert make_table(storage).aliases == {"Meter #": {"meter no": 0.8, "meter number": 0.9}}
+
+def test_segments_are_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(key_aliases, "ALIASES_MAX_SEGMENTS", 2)
+    storage = LocalStorage(str(tmp_path))
+    for number in range(3):
+        table = make_table(storage)
+        table.record("Meter #", f"meter {number}", 0.8)
+        table.reject("Meter #", [f"operator {number}"])
+        table.save()
+
+    compacted = make_table(storage)
+
+    assert len(list(storage.list_keys(compacted.prefix()))) == 1
+    assert make_table(storage).aliases == {"Meter #": {"meter 0": 0.8, "meter 1": 0.8, "meter 2": 0.8}}
+    assert make_table(storage).rejected == {"Meter #": {"operator 0", "operator 1", "operator 2"}}
@@ -0,0 +1,57 @@
+import json
+
+from src import metrics as metrics_module
+from src.metrics import Metrics
+
+def test_disabled_metrics_record_nothing():
+    recorder = Metrics(enabled=False)
+    recorder.start_invocation()
+
+    with recorder.stage("Render"):
+        pass
+    recorder.increment("Pages", 3)
+
+    assert recorder.timings == {}
+    assert recorder.counters == {}
+    assert recorder.emit() is None
+
+def test_event_override_lasts_one_invocation():
+    recorder = Metrics(enabled=False)
+
+    recorder.start_invocation(enabled=True)
+    recorder.increment("Pages", 3)
+    assert recorder.counters == {"Pages": 3}
+
+    recorder.start_invocation()
+    recorder.increment("Pages", 2)
+    assert not recorder.enabled
+    assert recorder.counters == {}
+
+def test_stages_accumulate_and_are_emitted_as_emf(capsys):
+    recorder = Metrics(namespace="Test", enabled=True)
+    recorder.start_invocation(profile=False)
+
+    @recorder.timed("AnalyzeDocument")
+    def analyze():
+        return "response"
+
+    assert analyze() == "response"
+    analyze()
+    recorder.increment("TextractCalls", 2)
+    document = recorder.emit({"Function": "extraction"})
+
+    assert json.loads(capsys.readouterr().out) == document
+    assert document["Function"] == "extraction"
+    assert document["TextractCalls"] == 2
+    assert document["AnalyzeDocumentTime"] >= 0
+    definition = document["_aws"]["CloudWatchMetrics"][0]
+    assert definition["Namespace"] == "Test"
+    assert definition["Dimensions"] == [["Function"]]
+    units = {metric["Name"]: metric["Unit"] for metric in definition["Metrics"]}
+    assert units["AnalyzeDocumentTime"] == "Milliseconds"
+    assert units["TextractCalls"] == "Count"
+
+def test_memory_without_resource_module(monkeypatch):
+    monkeypatch.setattr(metrics_module, "resource", None)
+
+    assert "PeakRSS" not in Metrics(enabled=True).memory()
@@ -0,0 +1,19 @@
+from src.page_triage import triage_page
+
+def test_blank_page_is_skipped(statement_page):
+    decision = triage_page(statement_page("0_blank.jpg", blank=True), 1)
+
+    assert decision["blank"]
+    assert decision["feature_types"] == []
+
+def test_empty_page_hint_skips_page(statement_page):
+    decision = triage_page(statement_page(), 1, {"1": []})
+
+    assert decision["blank"]
+    assert decision["reason"] == "template page hint: skip"
+
+def test_page_hint_sets_features(statement_page):
+    decision = triage_page(statement_page("1_statement.jpg", 2), 2, {"2": ["TABLES"]})
+
+    assert decision["feature_types"] == ["TABLES"]
+    assert not decision["blank"]
@@ -0,0 +1,90 @@
+from tests.conftest import key_value_blocks
+from src.refinement import find_low_confidence_regions, read_lines, refine_low_confidence
+
+TEMPLATE = {
+    "Statement": {"Meter #": "string", "Operator": "string"},
+    "Analysis": {"TableName": "Analysis", "ColumnNames": ["Component", "Mol %", "GPM"]}
+}
+
+class CropTextractClient:
+    """Answers DetectDocumentText on crops with one fixed line."""
+
+    def __init__(self, text, confidence):
+        self.text = text
+        self.confidence = confidence
+        self.calls = 0
+
+    def detect_document_text(self, Document):
+        assert Document["Bytes"][:2] == b"\xff\xd8"
+        self.calls += 1
+        return {"Blocks": [{"BlockType": "LINE", "Id": "crop-line", "Text": self.text, "Confidence": self.confidence}]}
+
+def page_response(kv_confidence=None, cell_confidence=None):
+    """
+    Builds an AnalyzeDocument response with Meter # and Unrelated key/values and an Analysis table.
+    :param kv_confidence: Confidence of every VALUE block, if set.
+    :param cell_confidence: Confidence of the Methane GPM cell, if set.
+    """
+    blocks = key_value_blocks({"Meter #": "12E45", "Unrelated": "x"})
+    for block in blocks:
+        if kv_confidence is not None and "VALUE" in block.get("EntityTypes", []):
+            block["Confidence"] = kv_confidence
+
+    rows = [["Component", "Mol %", "GPM"], ["Methane", "85.20", "1.Z34"]]
+    cell_ids = []
+    for row_number, row in enumerate(rows, start=1):
+        for column_number, text in enumerate(row, start=1):
+            word_id = f"cell-word-{row_number}-{column_number}"
+            blocks.append({"BlockType": "WORD", "Id": word_id, "Text": text})
+            cell = {"BlockType": "CELL", "Id": f"cell-{row_number}-{column_number}", "RowIndex": row_number,
+                    "ColumnIndex": column_number, "Relationships": [{"Type": "CHILD", "Ids": [word_id]}],
+                    "Geometry": {"BoundingBox": {"Top": 0.5 + 0.03 * row_number, "Left": 0.1 * column_number,
+                                                 "Width": 0.1, "Height": 0.03}}}
+            if (row_number, column_number) == (2, 3) and cell_confidence is not None:
+                cell["Confidence"] = cell_confidence
+            blocks.append(cell)
+            cell_ids.append(cell["Id"])
+    blocks.append({"BlockType": "TABLE", "Id": "table-1", "Relationships": [{"Type": "CHILD", "Ids": cell_ids}]})
+    return {"Blocks": blocks}, [[list(row) for row in rows]]
+
+def test_finds_only_low_confidence_template_fields():
+    response, tables = page_response(kv_confidence=40, cell_confidence=60)
+
+    regions = find_low_confidence_regions(response, tables, TEMPLATE)
+
+    assert [region["target"] for region in regions] == [("kv", "Meter #"), ("cell", 0, 1, 2)]
+
+def test_confident_page_has_no_regions():
+    response, tables = page_response()
+
+    assert find_low_confidence_regions(response, tables, TEMPLATE) == []
+
+def test_read_lines_averages_confidence():
+    response = {"Blocks": [{"BlockType": "LINE", "Text": "12345", "Confidence": 90},
+                           {"BlockType": "LINE", "Text": "Mcf", "Confidence": 80}]}
+
+    assert read_lines(response) == ("12345 Mcf", 85)
+    assert read_lines({"Blocks": []}) == ("", 0.0)
+
+def test_refines_fields_with_more_confident_crops(statement_page):
+    response, tables = page_response(kv_confidence=40, cell_confidence=60)
+    parsed_kv = {"Meter #": "12E45", "Unrelated": "x"}
+    client = CropTextractClient("12345", 99)
+
+    parsed_kv, tables, refined = refine_low_confidence(response, parsed_kv, tables, TEMPLATE, statement_page(),
+                                                       textract_client=client)
+
+    assert refined == 2
+    assert client.calls == 2
+    assert parsed_kv == {"Meter #": "12345", "Unrelated": "x"}
+    assert tables[0][1] == ["Methane", "85.20", "12345"]
+
+def test_keeps_fields_when_crop_is_less_confident(statement_page):
+    response, tables = page_response(kv_confidence=40)
+    parsed_kv = {"Meter #": "12E45"}
+
+    _, _, refined = refine_low_confidence(response, parsed_kv, tables, TEMPLATE, statement_page(),
+                                          textract_client=CropTextractClient("12345", 30))
+
+    assert refined == 0
+    assert parsed_kv == {"Meter #": "12E45"}
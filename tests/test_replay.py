@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import lambda_function
+import replay
+import src.template_matching as template_matching
+from src.key_aliases import aliases
+from src.response_store import bundle_key, load_bundle
+from src.storage import LocalStorage
+from src.textract_stub import LocalTextractClient
+
+TEMPLATE = {"Statement": {"Meter #": "string", "Operator": "string"}}
+
+@pytest.fixture
+def processed_document(tmp_path, monkeypatch, statement_pdf, recorded_responses):
+    """Processes a two-page statement offline, leaving its response bundle in local storage."""
+    def fail_load():
+        raise AssertionError("the template is passed down, not reloaded")
+    monkeypatch.setattr(lambda_function, "load_template", fail_load)
+    monkeypatch.setattr(template_matching, "load_template", fail_load)
+    monkeypatch.setattr(aliases, "enabled", False)
+
+    pdf_path = statement_pdf("statement.pdf", pages=2)
+    recorded_responses("0_statement.pdf", {"Meter #": "12345"})
+    responses_dir = recorded_responses("1_statement.pdf", {"Operator": "Acme Energy"})
+    storage = LocalStorage(str(tmp_path / "bucket"))
+    result, _ = lambda_function.process_document(pdf_path, "statements/statement.pdf", storage,
+                                                 LocalTextractClient(responses_dir), str(tmp_path / "pages"),
+                                                 template=TEMPLATE)
+    return storage, result
+
+@pytest.fixture
+def replay_worker(tmp_path, monkeypatch):
+    """Sets up this process as a replay worker reading bundles from the local bucket."""
+    template_path = tmp_path / "template.json"
+    template_path.write_text(json.dumps(TEMPLATE))
+    monkeypatch.setattr(aliases, "enabled", True)
+    replay.init_worker(str(tmp_path / "bucket"), str(tmp_path / "cache"), str(template_path), False)
+
+def test_bundle_records_every_analyzed_page(processed_document):
+    storage, result = processed_document
+
+    bundle = load_bundle(storage, bundle_key("statements/statement.pdf"))
+
+    assert result["Statement"] == {"Meter #": "12345", "Operator": "Acme Energy"}
+    assert bundle["document"] == "statements/statement.pdf"
+    assert [page["page"] for page in bundle["pages"]] == [1, 2]
+
+def test_replay_reproduces_result_and_caches_pages(processed_document, replay_worker):
+    _, result = processed_document
+    keys = [bundle_key("statements/statement.pdf")]
+
+    record, replayed = replay.replay_bundle(keys)
+    assert record["status"] == "ok"
+    assert record["cached_pages"] == 0
+    assert replayed == result
+
+    record, replayed = replay.replay_bundle(keys)
+    assert record["cached_pages"] == 2
+    assert replayed == result
+
+def test_group_bundles_groups_chunks_by_document():
+    keys = ["raw_responses/a-1.json.gz", "raw_responses/b-2.part-0001.json.gz", "raw_responses/b-2.part-0011.json.gz"]
+
+    assert replay.group_bundles(keys) == [["raw_responses/a-1.json.gz"],
+                                          ["raw_responses/b-2.part-0001.json.gz", "raw_responses/b-2.part-0011.json.gz"]]
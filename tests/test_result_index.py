@@ -0,0 +1,50 @@
+from src.result_index import ResultIndex, index_entry, write_segment
+from src.storage import LocalStorage
+
+def make_entry(result_uri, meter_no="12345", operator="Acme Gas", production_date="2024-01-31", indexed_at="2024-02-01T00:00:00"):
+    return {"result_uri": result_uri, "source_uri": f"s3://bucket/{result_uri}.pdf", "meter_no": meter_no,
+            "operator": operator, "production_date": production_date, "indexed_at": indexed_at}
+
+def test_upsert_keeps_newer_entry(tmp_path):
+    with ResultIndex(str(tmp_path / "results.sqlite")) as index:
+        index.add([make_entry("a", meter_no="111", indexed_at="2024-02-02T00:00:00")])
+        index.add([make_entry("a", meter_no="000", indexed_at="2024-02-01T00:00:00")])
+        assert [entry["meter_no"] for entry in index.query()] == ["111"]
+
+        index.add([make_entry("a", meter_no="222", indexed_at="2024-02-03T00:00:00")])
+        assert [entry["meter_no"] for entry in index.query()] == ["222"]
+        assert index.count() == 1
+
+def test_merge_combines_index_files(tmp_path):
+    other_path = str(tmp_path / "other.sqlite")
+    with ResultIndex(other_path) as other:
+        other.add([make_entry("a", meter_no="111", indexed_at="2024-02-03T00:00:00"),
+                   make_entry("b", meter_no="333", production_date="2024-02-29")])
+
+    with ResultIndex(str(tmp_path / "results.sqlite")) as index:
+        index.add([make_entry("a", meter_no="000", indexed_at="2024-02-02T00:00:00"),
+                   make_entry("c", meter_no="444", indexed_at="2024-02-05T00:00:00")])
+        assert index.merge(other_path) == 2
+
+        assert index.count() == 3
+        assert [entry["meter_no"] for entry in index.query(meter_no="111")] == ["111"]
+        assert index.query(date_from="2024-02-01")[0]["result_uri"] == "b"
+
+def test_sync_merges_each_segment_once(tmp_path):
+    storage = LocalStorage(str(tmp_path / "bucket"))
+    write_segment(storage, [make_entry("a"), make_entry("b", operator="Other")])
+
+    with ResultIndex(str(tmp_path / "results.sqlite")) as index:
+        assert index.sync(storage) == 1
+        assert index.sync(storage) == 0
+        assert [entry["result_uri"] for entry in index.query(operator="ACME GAS")] == ["a"]
+
+def test_index_entry_reads_statement_fields():
+    result = {"Statement": {"Meter #": " 12345 ", "Operator": "Acme Gas", "Production Date": ""}}
+
+    entry = index_entry(result, "out/result.json", "statements/a.pdf", "etag")
+
+    assert entry["meter_no"] == "12345"
+    assert entry["operator"] == "Acme Gas"
+    assert entry["production_date"] is None
+    assert entry["source_etag"] == "etag"
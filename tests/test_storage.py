@@ -0,0 +1,21 @@
+from src.storage import LocalStorage, document_id, parse_s3_uri
+
+def test_put_object_replaces_objects_whole(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.put_object("results/a.json", "{}")
+    storage.put_object("results/a.json", b'{"Meter #": "12345"}')
+    (tmp_path / "results" / ".b.json.123.456.tmp").write_text('{"Meter')
+
+    assert storage.get_object("results/a.json") == b'{"Meter #": "12345"}'
+    assert list(storage.list_keys("results/")) == ["results/a.json"]
+
+def test_parse_s3_uri():
+    assert parse_s3_uri("s3://statements/2024/01/statement.pdf") == ("statements", "2024/01/statement.pdf")
+    assert parse_s3_uri("s3://statements") == ("statements", "")
+
+def test_document_id_tells_same_named_files_apart():
+    first = document_id("2024/01/statement.pdf")
+
+    assert first.startswith("statement-")
+    assert first == document_id("2024/01/statement.pdf")
+    assert first != document_id("2024/02/statement.pdf")
@@ -0,0 +1,61 @@
+from src.table_index import TableIndex, looks_like_header
+
+TEMPLATE = {
+    "Physical Information": {
+        "Volumes": {"TableName": "Volumes", "ColumnNames": ["Description", "Mcf", "MMBtu"]}
+    },
+    "Analysis": {"TableName": "Analysis", "ColumnNames": ["Component", "GPM", "Mol"]}
+}
+
+VOLUMES_HEADER = ["Description", "Mcf", "MMBtu"]
+
+def test_tables_are_identified_by_header_and_title():
+    index = TableIndex(TEMPLATE)
+    index.add_page(1, [[VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]],
+                       [["Analysis", "", ""], ["Component", "GPM", "Mol"], ["c1", "0.1", "85.2"]]])
+
+    assert index.get("Physical Information/Volumes") == [VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]
+    assert index.get("Analysis")[-1] == ["c1", "0.1", "85.2"]
+    assert index.pages[1] == ["Physical Information/Volumes", "Analysis"]
+
+def test_continuation_with_repeated_header_is_stitched():
+    index = TableIndex(TEMPLATE)
+    index.add_page(1, [[VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]])
+    index.add_page(2, [[VOLUMES_HEADER, ["Net Delivered", "90", "95"]]])
+
+    assert index.get("Physical Information/Volumes") == [VOLUMES_HEADER, ["Gross Wellhead", "100", "110"],
+                                                         ["Net Delivered", "90", "95"]]
+
+def test_headerless_continuation_is_stitched():
+    index = TableIndex(TEMPLATE)
+    index.add_page(1, [[VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]])
+    index.add_page(2, [[["Net Delivered", "90", "95"], ["Residue Sale", "80", "85"]]])
+
+    assert index.get("Physical Information/Volumes")[-2:] == [["Net Delivered", "90", "95"], ["Residue Sale", "80", "85"]]
+
+def test_fragment_with_its_own_header_is_not_stitched():
+    index = TableIndex(TEMPLATE)
+    index.add_page(1, [[VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]])
+    index.add_page(2, [[["Check #", "Date", "Amount"], ["1001", "01/31/2024", "250.00"]]])
+    index.add_page(3, [[["Net Delivered", "90", "95"]]])
+
+    assert index.get("Physical Information/Volumes") == [VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]
+    assert index.open_table is None
+
+def test_continuation_must_start_the_next_page():
+    index = TableIndex(TEMPLATE)
+    index.add_page(1, [[VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]])
+    index.add_page(3, [[["Net Delivered", "90", "95"]]])
+
+    assert len(index.get("Physical Information/Volumes")) == 2
+
+def test_matched_data_nests_section_tables():
+    index = TableIndex(TEMPLATE)
+    index.add_page(1, [[VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]])
+
+    assert index.matched_data() == {"Physical Information": {"Volumes": [VOLUMES_HEADER, ["Gross Wellhead", "100", "110"]]}}
+
+def test_looks_like_header():
+    assert looks_like_header(["Check #", "Date", "Amount"])
+    assert not looks_like_header(["Methane", "85.2", "1.1"])
+    assert not looks_like_header(["Description", "", "MMBtu"])
@@ -0,0 +1,38 @@
+import pytest
+
+import src.template_matching as template_matching
+from src.key_aliases import AliasTable
+from src.storage import LocalStorage
+from src.template_matching import find_matching_value
+
+TEMPLATE = {"Statement": {"Meter #": "str"}}
+
+@pytest.fixture
+def alias_table(tmp_path, monkeypatch):
+    table = AliasTable(enabled=True)
+    table.configure(LocalStorage(str(tmp_path)))
+    table.use(TEMPLATE)
+    monkeypatch.setattr(template_matching, 'aliases', table)
+    return table
+
+def test_find_matching_value_without_aliases(monkeypatch):
+    monkeypatch.setattr(template_matching, 'aliases', AliasTable(enabled=False))
+    assert find_matching_value({"Meter No.": "WRONG", "Meter #": "RIGHT"}, "Meter #") == "RIGHT"
+
+def test_find_matching_value_learns_alias(alias_table):
+    assert find_matching_value({"Meter No.": "12345"}, "Meter #") == "12345"
+    assert "meter no" in alias_table.aliases["Meter #"]
+
+def test_known_alias_loses_to_better_unseen_key(alias_table):
+    find_matching_value({"Meter No.": "12345"}, "Meter #")
+    assert find_matching_value({"Meter No.": "WRONG", "Meter #": "RIGHT"}, "Meter #") == "RIGHT"
+
+def test_known_alias_matches_without_fuzzy_comparison(alias_table, monkeypatch):
+    find_matching_value({"Meter No.": "12345", "Operator": "Acme"}, "Meter #")
+    monkeypatch.setattr(template_matching, 'SequenceMatcher', None)
+    assert find_matching_value({"Meter No.": "67890", "Operator": "Acme"}, "Meter #") == "67890"
+
+def test_rejected_key_is_not_matched(alias_table):
+    assert find_matching_value({"Operator": "Acme"}, "Meter #") is None
+    assert "operator" in alias_table.rejected["Meter #"]
+    assert find_matching_value({"Operator": "Acme"}, "Meter #") is None
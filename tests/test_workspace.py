@@ -0,0 +1,94 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import lambda_function
+from src.key_aliases import aliases
+from src.storage import LocalStorage
+from src.textract_stub import LocalTextractClient
+from src.workspace import Workspace, WorkspaceBudgetExceeded, pid_alive, reclaim_stale
+
+def write_bytes(path, size):
+    with open(path, 'wb') as file:
+        file.write(b'x' * size)
+    return path
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def test_budget_is_enforced_and_released(tmp_path):
+    with Workspace("statement", mode="disk", root=str(tmp_path)) as workspace:
+        workspace.budget = 100
+        first = workspace.track(write_bytes(workspace.file("first"), 80))
+        workspace.release(first)
+        workspace.track(write_bytes(workspace.file("second"), 80))
+
+        with pytest.raises(WorkspaceBudgetExceeded):
+            workspace.track(write_bytes(workspace.file("third"), 40))
+        assert workspace.peak == 120
+        assert workspace.released == 80
+        path = workspace.path
+
+    assert not os.path.exists(path)
+    assert path not in Workspace.active
+
+def test_workspace_is_removed_when_processing_fails(tmp_path):
+    with pytest.raises(RuntimeError):
+        with Workspace("statement", mode="disk", root=str(tmp_path)) as workspace:
+            write_bytes(workspace.file("page.jpg"), 10)
+            raise RuntimeError("analysis failed")
+
+    assert os.listdir(tmp_path) == []
+
+def test_stale_workspaces_of_dead_processes_are_reclaimed(tmp_path):
+    stale = tmp_path / f"{dead_pid()}-statement-abc"
+    stale.mkdir()
+    write_bytes(stale / "page.jpg", 10)
+    running = tmp_path / f"{os.getppid()}-statement-def"
+    running.mkdir()
+
+    assert reclaim_stale(str(tmp_path)) == 10
+    assert not stale.exists()
+    assert running.exists()
+
+def test_pid_alive():
+    assert pid_alive(os.getpid())
+    assert not pid_alive(dead_pid())
+
+@pytest.fixture
+def small_workspace(tmp_path):
+    with Workspace("statement", mode="disk", root=str(tmp_path / "workspaces")) as workspace:
+        workspace.budget = 1
+        yield workspace
+
+def test_chunk_over_budget_returns_error_payload(tmp_path, monkeypatch, statement_pdf, small_workspace):
+    monkeypatch.setattr(aliases, "enabled", False)
+    storage = LocalStorage(str(tmp_path / "bucket"))
+    storage.upload_file(statement_pdf("statement.pdf"), "chunks/statement/statement_pages_0001-0001.pdf")
+    task = {"key": "chunks/statement/statement_pages_0001-0001.pdf", "source_key": "statements/statement.pdf",
+            "first_page": 1, "last_page": 1}
+
+    payload = lambda_function.process_chunk(task, storage, LocalTextractClient(), workspace=small_workspace,
+                                            template={"Statement": {"Meter #": "string"}})
+
+    assert payload["first_page"] == 1
+    assert "Workspace budget exceeded" in payload["error"]
+
+def test_document_over_budget_returns_500(tmp_path, monkeypatch, statement_pdf, small_workspace):
+    pdf_path = statement_pdf("statement.pdf")
+
+    class LocalS3Client:
+        def download_file(self, bucket, key, path):
+            shutil.copy(pdf_path, path)
+
+    monkeypatch.setattr(lambda_function, "s3_client", LocalS3Client())
+    event = {"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": "statements/statement.pdf"}}}]}
+
+    response = lambda_function.process_object(event, "bucket", "statements/statement.pdf", small_workspace)
+
+    assert response["statusCode"] == 500
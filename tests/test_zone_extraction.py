@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import lambda_function
+import replay
+from src.key_aliases import aliases
+from src.response_store import bundle_key, load_bundle
+from src.storage import LocalStorage
+from src.textract_stub import LocalTextractClient
+from src.zone_extraction import page_words, read_zone
+
+def line_response(words):
+    """Builds a DetectDocumentText response with one LINE per (text, left, top) word."""
+    blocks = []
+    for number, (text, left, top) in enumerate(words):
+        blocks.append({"BlockType": "WORD", "Id": f"word-{number}", "Text": text,
+                       "Geometry": {"BoundingBox": {"Left": left, "Top": top, "Width": 0.05, "Height": 0.01}}})
+        blocks.append({"BlockType": "LINE", "Id": f"line-{number}",
+                       "Relationships": [{"Type": "CHILD", "Ids": [f"word-{number}"]}]})
+    return {"Blocks": blocks}
+
+def test_right_zone_reads_value_slightly_above_anchor_line():
+    words = page_words(line_response([("Meter", 0.1, 0.1010), ("#", 0.16, 0.1010), ("12345", 0.3, 0.1006),
+                                      ("Operator", 0.1, 0.1200), ("Acme", 0.3, 0.1200)]))
+
+    assert read_zone(words, {"Anchor": "Meter #", "Width": 0.3}) == "12345"
+
+def test_below_zone_reads_next_line():
+    words = page_words(line_response([("Remit", 0.1, 0.10), ("To", 0.16, 0.10), ("Acme", 0.1, 0.112)]))
+
+    assert read_zone(words, {"Anchor": "Remit To", "Direction": "below", "Width": 0.3}) == "Acme"
+    assert read_zone(words, {"Anchor": "Missing"}) is None
+
+class FeatureTextractClient(LocalTextractClient):
+    """Recorded responses that, like Textract, only hold key-value pairs when FORMS is requested."""
+
+    def __init__(self, responses_dir):
+        super().__init__(responses_dir)
+        self.feature_types = []
+
+    def analyze_document(self, Document, FeatureTypes=None, **kwargs):
+        self.feature_types.append(FeatureTypes)
+        response = super().analyze_document(Document, FeatureTypes, **kwargs)
+        if "FORMS" not in FeatureTypes:
+            response = {**response, "Blocks": [block for block in response["Blocks"]
+                                               if block["BlockType"] != "KEY_VALUE_SET"]}
+        return response
+
+def zoned_template(zones, page_features=None):
+    hints = {"Zones": zones}
+    if page_features:
+        hints["PageFeatures"] = page_features
+    return {"Statement": {"Meter #": "string", "Operator": "string"}, "_Hints": hints}
+
+METER_ZONE = {"Anchor": "Meter #", "Width": 0.5, "Pattern": r"\d+"}
+OPERATOR_ZONE = {"Anchor": "Operator", "Width": 0.5}
+
+@pytest.fixture
+def run_zoned(tmp_path, monkeypatch, statement_pdf, recorded_responses):
+    """Processes a one-page statement offline against a zoned template."""
+    monkeypatch.setattr(aliases, "enabled", False)
+    pdf_path = statement_pdf("statement.pdf")
+    responses_dir = recorded_responses("0_statement.pdf", {"Meter #": "12345", "Operator": "Acme Energy"})
+    storage = LocalStorage(str(tmp_path / "bucket"))
+    client = FeatureTextractClient(responses_dir)
+
+    def run(template):
+        result, _ = lambda_function.process_document(pdf_path, "statements/statement.pdf", storage, client,
+                                                     str(tmp_path / "pages"), template=template)
+        return result, client, storage
+    return run
+
+def test_zones_covering_some_fields_keep_forms(run_zoned):
+    result, client, _ = run_zoned(zoned_template({"Statement/Meter #": METER_ZONE}))
+
+    assert result["Statement"] == {"Meter #": "12345", "Operator": "Acme Energy"}
+    assert all("FORMS" in feature_types for feature_types in client.feature_types)
+
+def test_zones_covering_every_field_skip_analysis(run_zoned):
+    result, client, storage = run_zoned(zoned_template({"Statement/Meter #": METER_ZONE,
+                                                        "Statement/Operator": OPERATOR_ZONE}, {"1": ["FORMS"]}))
+
+    assert result["Statement"] == {"Meter #": "12345", "Operator": "Acme Energy"}
+    assert client.feature_types == []
+    page = load_bundle(storage, bundle_key("statements/statement.pdf"))["pages"][0]
+    assert page["response"] is None
+    assert page["text_response"]["Blocks"]
+
+def test_replay_rereads_zones(run_zoned, tmp_path, monkeypatch):
+    template = zoned_template({"Statement/Meter #": METER_ZONE, "Statement/Operator": OPERATOR_ZONE}, {"1": ["FORMS"]})
+    result, _, _ = run_zoned(template)
+    template_path = tmp_path / "template.json"
+    template_path.write_text(json.dumps(template))
+    replay.init_worker(str(tmp_path / "bucket"), str(tmp_path / "cache"), str(template_path), False)
+
+    record, replayed = replay.replay_bundle([bundle_key("statements/statement.pdf")])
+
+    assert record["status"] == "ok"
+    assert replayed == result